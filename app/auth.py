@@ -1,49 +1,101 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import Row, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from typing import Optional
+from dataclasses import dataclass
+import secrets
 
 # Importações principais que não causam ciclos
 from app import models
-from app.core.security import decode_access_token, verify_password
-from app.database import get_db
+from app.core.cache import principal_cache, token_state_cache
+from app.core.security import decode_access_token, get_password_hash_async, verify_password_async
+from app.database import get_db, AsyncSessionLocal
 
 # O import de 'crud' foi removido do topo para evitar importações circulares
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[models.Professor | models.Estudante]:
+# Hash de referência usado quando o email não existe, para que toda tentativa
+# de login custe exatamente uma verificação de senha.
+_DUMMY_PASSWORD_HASH: Optional[str] = None
+
+async def _get_dummy_password_hash() -> str:
+    global _DUMMY_PASSWORD_HASH
+    if _DUMMY_PASSWORD_HASH is None:
+        _DUMMY_PASSWORD_HASH = await get_password_hash_async(secrets.token_urlsafe(16))
+    return _DUMMY_PASSWORD_HASH
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[Row]:
     """
-    Autentica um usuário (professor ou estudante) e retorna o objeto do modelo se for bem-sucedido.
+    Autentica um usuário (professor ou estudante) e retorna a linha de login
+    (id, email, hashed_password, user_type, role) se for bem-sucedido.
     """
     # Importação local para quebrar o ciclo de dependência
     from app import crud
 
-    # Tenta encontrar um professor com o email fornecido
-    professor = await crud.get_professor_by_email(db, email=email)
-    if professor and verify_password(password, professor.hashed_password):
-        return professor
+    # Uma única consulta resolve o tipo de conta e o hash da senha
+    login_user = await crud.get_login_user_by_email(db, email=email)
+    if login_user is None:
+        await verify_password_async(password, await _get_dummy_password_hash())
+        return None
+
+    if await verify_password_async(password, login_user.hashed_password):
+        return login_user
 
-    # Se não for um professor, tenta encontrar um estudante
-    estudante = await crud.get_estudante_by_email(db, email=email)
-    if estudante and verify_password(password, estudante.hashed_password):
-        return estudante
-    
     # Retorna None se a autenticação falhar
     return None
 
-async def get_current_user_from_token(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> models.Professor | models.Estudante:
+async def rehash_user_password(user_type: str, user_id: int, password: str, old_hash: str) -> None:
     """
-    Decodifica o token JWT e retorna o usuário atual do banco de dados.
+    Refaz o hash da senha com os parâmetros atuais. Executado em segundo plano
+    após um login bem-sucedido cujo hash foi gerado com outro custo/esquema.
     """
     # Importação local para quebrar o ciclo de dependência
     from app import crud
 
-    credentials_exception = HTTPException(
+    try:
+        new_hash = await get_password_hash_async(password)
+        async with AsyncSessionLocal() as db:
+            await crud.update_password_hash(db, user_type=user_type, user_id=user_id, old_hash=old_hash, new_hash=new_hash)
+            await db.commit()
+    except Exception as e:
+        print(f"AVISO:    Não foi possível atualizar o hash da senha do usuário {user_type}:{user_id}: {e}")
+
+def _snapshot_user(user):
+    """
+    Cria uma cópia desanexada (detached) do usuário para guardar no cache,
+    incluindo o curso coordenado já carregado no caso de professores.
+    """
+    def _copiar_colunas(obj):
+        mapper = inspect(obj).mapper
+        return mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+    copia = _copiar_colunas(user)
+    if isinstance(user, models.Professor):
+        curso = user.curso_coordenado
+        copia.curso_coordenado = _copiar_colunas(curso) if curso else None
+        if copia.curso_coordenado is not None:
+            make_transient_to_detached(copia.curso_coordenado)
+    make_transient_to_detached(copia)
+    return copia
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def get_current_user_from_token(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db, scope="function")) -> models.Professor | models.Estudante:
+    """
+    Decodifica o token JWT e retorna o usuário atual do banco de dados.
+    """
+    # Importação local para quebrar o ciclo de dependência
+    from app import crud
+
+    credentials_exception = _credentials_exception()
     payload = decode_access_token(token)
     if payload is None:
         raise credentials_exception
@@ -54,16 +106,91 @@ async def get_current_user_from_token(token: str = Depends(oauth2_scheme), db: A
     if email is None or user_type is None:
         raise credentials_exception
     
-    user: Optional[models.Professor | models.Estudante] = None
-    if user_type == "professor":
-        user = await crud.get_professor_by_email(db, email=email)
-    elif user_type == "estudante":
-        user = await crud.get_estudante_by_email(db, email=email)
-    
-    if user is None:
+    cache_key = (email, user_type)
+    cached_user = principal_cache.get(cache_key)
+    if cached_user is not None:
+        # merge(load=False) anexa uma cópia do snapshot à sessão atual sem executar SQL
+        user = await db.merge(cached_user, load=False)
+    else:
+        user: Optional[models.Professor | models.Estudante] = None
+        if user_type == "professor":
+            user = await crud.get_professor_by_email(db, email=email)
+        elif user_type == "estudante":
+            user = await crud.get_estudante_by_email(db, email=email)
+
+        if user is None:
+            raise credentials_exception
+        principal_cache.set(cache_key, _snapshot_user(user))
+
+    # Tokens emitidos antes de um arquivamento ou troca de papel são rejeitados
+    token_version = payload.get("ver")
+    if token_version is not None and token_version != user.token_version:
         raise credentials_exception
     return user
 
+@dataclass(frozen=True)
+class Principal:
+    """
+    Usuário autenticado montado apenas a partir dos claims do token,
+    para handlers que só precisam do id e do papel.
+    """
+    id: int
+    email: str
+    user_type: str
+    role: Optional[models.UserRole] = None
+
+    @property
+    def is_professor(self) -> bool:
+        return self.user_type == "professor"
+
+    @property
+    def is_estudante(self) -> bool:
+        return self.user_type == "estudante"
+
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db, scope="function")) -> Principal:
+    """
+    Autentica a partir dos claims do token, sem carregar o usuário completo.
+    A revogação é garantida comparando a versão do token com a do banco
+    (consulta de uma linha, mantida em cache por alguns segundos).
+    """
+    # Importação local para quebrar o ciclo de dependência
+    from app import crud
+
+    credentials_exception = _credentials_exception()
+    payload = decode_access_token(token)
+    if payload is None:
+        raise credentials_exception
+
+    user_id: Optional[int] = payload.get("uid")
+    email: Optional[str] = payload.get("sub")
+    user_type: Optional[str] = payload.get("user_type")
+    token_version: Optional[int] = payload.get("ver")
+    if user_id is None or email is None or user_type not in ("professor", "estudante") or token_version is None:
+        raise credentials_exception
+
+    state_key = (user_type, user_id)
+    token_state = token_state_cache.get(state_key)
+    if token_state is None:
+        row = await crud.get_token_state(db, user_type=user_type, user_id=user_id)
+        if row is None:
+            raise credentials_exception
+        token_state = (row.token_version, row.status)
+        token_state_cache.set(state_key, token_state)
+
+    current_version, user_status = token_state
+    if current_version != token_version:
+        raise credentials_exception
+    if user_type == "estudante" and user_status == models.StatusEstudante.INATIVO:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Estudante inativo.")
+
+    role = payload.get("role")
+    return Principal(
+        id=user_id,
+        email=email,
+        user_type=user_type,
+        role=models.UserRole(role) if role else None,
+    )
+
 async def get_current_active_user(current_user: models.Professor | models.Estudante = Depends(get_current_user_from_token)):
     """
     Um dependente que verifica se o usuário atual está ativo.
@@ -0,0 +1,225 @@
+"""
+Importação em lote de estudantes e professores a partir de CSV ou JSONL.
+
+O arquivo é lido linha a linha e preparado em lotes de BATCH_SIZE: validação com
+os mesmos schemas do cadastro individual, checagem de duplicados no próprio arquivo
+e no banco com consultas por conjunto (IN) e hash das senhas no pool de hashing.
+Só depois que todos os lotes estão prontos vêm os INSERTs multi-row, seguidos do
+commit da requisição: o bcrypt (a parte lenta) roda antes de qualquer escrita, e as
+linhas inseridas não ficam bloqueadas enquanto o resto do arquivo é processado.
+Linhas com problema não interrompem a importação; elas voltam no relatório de erros
+com o número da linha.
+"""
+import asyncio
+import csv
+import io
+import itertools
+import json
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple, Type
+
+from fastapi import UploadFile
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models, schemas
+from app.core.cache import PROFESSORES_NAMESPACE, response_cache
+from app.core.security import password_hasher
+from app.database import run_after_commit
+from app.search import search_index
+
+BATCH_SIZE = 500
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class _ImportSpec:
+    model: type
+    schema: Type[BaseModel]
+    # Campo único além do email (matrícula ou SIAPE)
+    unique_field: str
+
+
+IMPORT_SPECS = {
+    "students": _ImportSpec(models.Estudante, schemas.EstudanteCreate, "matricula"),
+    "professors": _ImportSpec(models.Professor, schemas.ProfessorCreate, "siape"),
+}
+
+
+def detect_format(filename: Optional[str], formato: Optional[str] = None) -> str:
+    formato = (formato or (filename or "").rsplit(".", 1)[-1]).lower()
+    if formato == "csv":
+        return "csv"
+    if formato in ("jsonl", "ndjson"):
+        return "jsonl"
+    raise ImportFormatError("Formato não suportado: envie um arquivo .csv ou .jsonl.")
+
+
+def _iter_records(upload: UploadFile, formato: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Gera (linha, registro, erro_de_leitura) sem carregar o arquivo inteiro na memória.
+    """
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    try:
+        if formato == "csv":
+            reader = csv.DictReader(text)
+            for row in reader:
+                # Células vazias equivalem a campos opcionais ausentes
+                yield reader.line_num, {k: v for k, v in row.items() if k and v not in (None, "")}, None
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, None, f"JSON inválido: {e.msg}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, None, "Cada linha deve ser um objeto JSON."
+                    continue
+                yield line_number, record, None
+    except UnicodeDecodeError:
+        raise ImportFormatError("O arquivo deve estar em UTF-8.")
+    finally:
+        # Não fecha o arquivo do upload junto com o wrapper
+        text.detach()
+
+
+def _read_chunk(records: Iterator, size: int) -> list:
+    return list(itertools.islice(records, size))
+
+
+def _validation_messages(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()]
+
+
+class _UserImport:
+    def __init__(self, db: AsyncSession, spec: _ImportSpec):
+        self.db = db
+        self.spec = spec
+        self.total = 0
+        self.created = 0
+        self.errors: List[schemas.ImportacaoErroLinha] = []
+        # Duplicados dentro do próprio arquivo
+        self.seen_emails: set = set()
+        self.seen_unique: set = set()
+
+    def add_error(self, line: int, email: Optional[str], *messages: str) -> None:
+        self.errors.append(schemas.ImportacaoErroLinha(linha=line, email=email, erros=list(messages)))
+
+    async def prepare_batch(self, batch: List[Tuple[int, dict]]) -> List[Tuple[int, BaseModel, dict]]:
+        """
+        Valida o lote, descarta conflitos e calcula os hashes. Só lê do banco.
+        Retorna (linha, usuário, linha a inserir) de cada registro válido.
+        """
+        spec = self.spec
+        candidates: List[Tuple[int, BaseModel]] = []
+        for line, record in batch:
+            try:
+                user_in = spec.schema.model_validate(record)
+            except ValidationError as e:
+                self.add_error(line, record.get("email"), *_validation_messages(e))
+                continue
+            unique_value = getattr(user_in, spec.unique_field)
+            if user_in.email in self.seen_emails:
+                self.add_error(line, user_in.email, "Email repetido no arquivo.")
+                continue
+            if unique_value in self.seen_unique:
+                self.add_error(line, user_in.email, f"{spec.unique_field} repetido no arquivo.")
+                continue
+            self.seen_emails.add(user_in.email)
+            self.seen_unique.add(unique_value)
+            candidates.append((line, user_in))
+        if not candidates:
+            return []
+
+        # Uma consulta por tipo de conflito para o lote inteiro
+        unique_column = getattr(spec.model, spec.unique_field)
+        existing_emails = await crud.get_existing_emails(self.db, (u.email for _, u in candidates))
+        existing_unique = await crud.get_existing_values(
+            self.db, unique_column, (getattr(u, spec.unique_field) for _, u in candidates)
+        )
+        existing_cursos = set()
+        if spec.model is models.Estudante:
+            existing_cursos = await crud.get_existing_values(
+                self.db, models.Curso.id_curso, {u.curso_id for _, u in candidates if u.curso_id}
+            )
+
+        valid: List[Tuple[int, BaseModel]] = []
+        for line, user_in in candidates:
+            problems = []
+            if user_in.email in existing_emails:
+                problems.append("Email já cadastrado.")
+            if getattr(user_in, spec.unique_field) in existing_unique:
+                problems.append(f"{spec.unique_field} já cadastrado.")
+            if spec.model is models.Estudante and user_in.curso_id and user_in.curso_id not in existing_cursos:
+                problems.append(f"Curso com id {user_in.curso_id} não encontrado.")
+            if problems:
+                self.add_error(line, user_in.email, *problems)
+            else:
+                valid.append((line, user_in))
+        if not valid:
+            return []
+
+        hashes = await password_hasher.hash_many([user_in.password for _, user_in in valid])
+        prepared = []
+        for (line, user_in), hashed_password in zip(valid, hashes):
+            row = user_in.model_dump(exclude={"password"})
+            row["hashed_password"] = hashed_password
+            prepared.append((line, user_in, row))
+        return prepared
+
+    async def insert(self, prepared: List[Tuple[int, BaseModel, dict]]) -> None:
+        rows = [row for _, _, row in prepared]
+        try:
+            async with self.db.begin_nested():
+                await crud.bulk_insert(self.db, self.spec.model, rows)
+            self.created += len(rows)
+            return
+        except IntegrityError:
+            # Conflito com um cadastro concorrente: refaz linha a linha para isolar a(s) culpada(s)
+            pass
+        for line, user_in, row in prepared:
+            try:
+                async with self.db.begin_nested():
+                    await crud.bulk_insert(self.db, self.spec.model, [row])
+                self.created += 1
+            except IntegrityError:
+                self.add_error(line, user_in.email, "Conflito com um cadastro existente.")
+
+
+async def import_users(db: AsyncSession, upload: UploadFile, user_type: str, formato: str) -> schemas.ImportacaoResultado:
+    """
+    Importa os usuários do arquivo (`user_type` é "students" ou "professors").
+    As linhas válidas são gravadas no commit da requisição; as demais vão para o relatório.
+    """
+    importer = _UserImport(db, IMPORT_SPECS[user_type])
+    prepared_batches: List[List[Tuple[int, BaseModel, dict]]] = []
+    records = _iter_records(upload, formato)
+    # A leitura e o parse do arquivo rodam em uma thread, um lote por vez, sem travar o event loop
+    while chunk := await asyncio.to_thread(_read_chunk, records, BATCH_SIZE):
+        batch: List[Tuple[int, dict]] = []
+        for line, record, read_error in chunk:
+            importer.total += 1
+            if read_error:
+                importer.add_error(line, None, read_error)
+                continue
+            batch.append((line, record))
+        if batch:
+            prepared_batches.append(await importer.prepare_batch(batch))
+    # Escritas só no fim, para que os locks durem apenas até o commit logo em seguida
+    for prepared in prepared_batches:
+        if prepared:
+            await importer.insert(prepared)
+    if importer.created:
+        # Reconstruir o índice de busca sai mais barato que indexar linha a linha
+        run_after_commit(db, search_index.mark_stale)
+        if importer.spec.model is models.Professor:
+            run_after_commit(db, lambda: response_cache.invalidate(PROFESSORES_NAMESPACE))
+    importer.errors.sort(key=lambda error: error.linha)
+    return schemas.ImportacaoResultado(total=importer.total, criados=importer.created, erros=importer.errors)
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+
+
+class TTLCache:
+    """
+    Cache em memória, local ao processo, com expiração por tempo (TTL) e descarte LRU.
+    Seguro para uso concorrente e com contadores de acertos/erros para métricas.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class ResponseCache:
+    """
+    Respostas JSON já serializadas, agrupadas por namespace (ex.: "cursos").
+    Invalidar um namespace incrementa a sua geração, que faz parte da chave: as
+    entradas antigas deixam de ser encontradas e saem pelo LRU/TTL, sem varrer o cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations: Dict[str, int] = {}
+        self.invalidations = 0
+
+    def key(self, namespace: str, params: Hashable, bypass: bool = False) -> Optional[Hashable]:
+        """
+        Chave da resposta. Deve ser obtida antes da consulta ao banco: se uma escrita
+        invalidar o namespace no meio do caminho, a resposta antiga fica sob a geração antiga.
+        Com `bypass` (ex.: cliente lendo as próprias escritas) a chave é None: a
+        resposta não vem do cache nem é guardada nele.
+        """
+        if bypass:
+            return None
+        return (namespace, self._generations.get(namespace, 0), params)
+
+    def get(self, key: Optional[Hashable]) -> Optional[Response]:
+        if key is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        body, headers = entry
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def store(
+        self, key: Optional[Hashable], adapter: TypeAdapter, data: Any, headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """
+        Serializa `data` com `adapter`, guarda os bytes e devolve a resposta pronta.
+        """
+        body = adapter.dump_json(data)
+        headers = dict(headers or {})
+        if key is not None:
+            self._entries.set(key, (body, headers))
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, namespace: str) -> None:
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), "invalidations": self.invalidations}
+
+
+# Usuários autenticados, indexados por (sub, user_type) do token.
+# O cache é por processo: escritas em outros workers só são vistas após o TTL.
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+# Claims de tokens JWT já validados, indexados pelo digest SHA-256 do token.
+token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL_SECONDS,
+)
+
+# Versão do token e status de cada usuário, indexados por (user_type, id).
+token_state_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_STATE_CACHE_TTL_SECONDS,
+)
+
+# Respostas de listas de referência, indexadas por (namespace, geração, parâmetros).
+CURSOS_NAMESPACE = "cursos"
+PROFESSORES_NAMESPACE = "professores"
+response_cache = ResponseCache(
+    maxsize=settings.RESPONSE_CACHE_MAX_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
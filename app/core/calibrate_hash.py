@@ -0,0 +1,105 @@
+"""
+Calibra o custo do hash de senhas no host de deploy.
+
+Mede o tempo de hash para cada fator de custo do bcrypt (ou conjunto de parâmetros
+do argon2) e escolhe o mais alto que fica dentro do tempo alvo por login.
+Com --write, grava os parâmetros escolhidos no arquivo .env lido pelo Settings.
+
+Uso:
+    python -m app.core.calibrate_hash --target-ms 250
+    python -m app.core.calibrate_hash --scheme argon2 --target-ms 300 --write .env
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS_RANGE = range(10, 17)
+ARGON2_TIME_COST_RANGE = range(1, 11)
+SAMPLE_PASSWORD = "calibracao-de-senha-123"
+
+
+def _measure_ms(context: CryptContext, samples: int) -> float:
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.hash(SAMPLE_PASSWORD)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_bcrypt(target_ms: float, samples: int) -> dict:
+    chosen = {"PASSWORD_HASH_SCHEME": "bcrypt", "BCRYPT_ROUNDS": BCRYPT_ROUNDS_RANGE.start}
+    for rounds in BCRYPT_ROUNDS_RANGE:
+        elapsed = _measure_ms(CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds), samples)
+        print(f"bcrypt rounds={rounds:<2} {elapsed:8.1f} ms")
+        if elapsed > target_ms:
+            break
+        chosen["BCRYPT_ROUNDS"] = rounds
+    return chosen
+
+
+def calibrate_argon2(target_ms: float, samples: int, memory_cost: int, parallelism: int) -> dict:
+    chosen = {
+        "PASSWORD_HASH_SCHEME": "argon2",
+        "ARGON2_TIME_COST": ARGON2_TIME_COST_RANGE.start,
+        "ARGON2_MEMORY_COST": memory_cost,
+        "ARGON2_PARALLELISM": parallelism,
+    }
+    for time_cost in ARGON2_TIME_COST_RANGE:
+        context = CryptContext(
+            schemes=["argon2"],
+            argon2__time_cost=time_cost,
+            argon2__memory_cost=memory_cost,
+            argon2__parallelism=parallelism,
+        )
+        elapsed = _measure_ms(context, samples)
+        print(f"argon2 time_cost={time_cost:<2} memory_cost={memory_cost} parallelism={parallelism} {elapsed:8.1f} ms")
+        if elapsed > target_ms:
+            break
+        chosen["ARGON2_TIME_COST"] = time_cost
+    return chosen
+
+
+def write_env(path: Path, values: dict) -> None:
+    """
+    Atualiza (ou acrescenta) as chaves no arquivo .env, preservando as demais linhas.
+    """
+    lines = path.read_text().splitlines() if path.exists() else []
+    pending = dict(values)
+    for index, line in enumerate(lines):
+        key = line.split("=", 1)[0].strip()
+        if key in pending:
+            lines[index] = f"{key}={pending.pop(key)}"
+    lines.extend(f"{key}={value}" for key, value in pending.items())
+    path.write_text("\n".join(lines) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Calibra o custo do hash de senhas para este host.")
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250, help="Tempo máximo de hash por login, em ms.")
+    parser.add_argument("--samples", type=int, default=5, help="Medições por configuração (usa a mediana).")
+    parser.add_argument("--argon2-memory-cost", type=int, default=65536, help="Memória do argon2 em KiB.")
+    parser.add_argument("--argon2-parallelism", type=int, default=4)
+    parser.add_argument("--write", metavar="ENV_FILE", help="Grava os parâmetros escolhidos neste arquivo .env.")
+    args = parser.parse_args()
+
+    if args.scheme == "bcrypt":
+        chosen = calibrate_bcrypt(args.target_ms, args.samples)
+    else:
+        chosen = calibrate_argon2(args.target_ms, args.samples, args.argon2_memory_cost, args.argon2_parallelism)
+
+    print("\nParâmetros escolhidos:")
+    for key, value in chosen.items():
+        print(f"  {key}={value}")
+
+    if args.write:
+        write_env(Path(args.write), chosen)
+        print(f"\nGravado em {args.write}. Reinicie a API para aplicar; hashes antigos serão refeitos no próximo login.")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,71 @@ from functools import lru_cache
 class Settings(BaseSettings):
     # Variáveis que a sua aplicação FastAPI realmente precisa
     DATABASE_URL: str
+    # Pool de conexões e log de SQL
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: int = 30
+    # Réplicas de leitura (URLs separadas por vírgula) usadas pelos endpoints de listagem.
+    # Após uma escrita, o mesmo cliente lê do primário por REPLICA_STICKY_SECONDS.
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_STICKY_SECONDS: int = 5
+
+    # Inicialização: tentativas de conexão com backoff exponencial e jitter
+    DB_STARTUP_MAX_RETRIES: int = 8
+    DB_STARTUP_BACKOFF_BASE_SECONDS: float = 0.5
+    DB_STARTUP_BACKOFF_MAX_SECONDS: float = 10
+    # Identificador do deploy (ex.: tag da imagem). O seed do admin roda uma vez por valor;
+    # vazio significa uma vez por email de admin.
+    DEPLOYMENT_ID: str = ""
+    # Modo de depuração: expõe contagem/tempo de SQL nos headers e loga cada requisição
+    DEBUG: bool = False
+    # Requisições acima deste número de consultas SQL são logadas mesmo fora do DEBUG
+    QUERY_COUNT_WARN_THRESHOLD: int = 20
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Cache dos usuários autenticados (evita consultar o banco a cada requisição)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 2048
+    # Cache de tokens JWT já verificados (a entrada nunca vive além do 'exp' do token)
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    TOKEN_CACHE_MAX_SIZE: int = 4096
+    # Versão do token/status por usuário; define a janela máxima para revogação entre workers
+    TOKEN_STATE_CACHE_TTL_SECONDS: int = 10
+    # Respostas prontas (bytes JSON) de listas de referência como cursos e professores.
+    # Escritas deste worker invalidam na hora; nos demais, a resposta vive no máximo o TTL.
+    RESPONSE_CACHE_TTL_SECONDS: int = 30
+    RESPONSE_CACHE_MAX_SIZE: int = 512
+    # Índice de busca em memória: reconstruído após este intervalo para refletir escritas de outros workers
+    SEARCH_INDEX_REFRESH_SECONDS: int = 300
+
+    # Parâmetros do hash de senhas; ajuste com `python -m app.core.calibrate_hash`.
+    # "argon2" requer o pacote argon2-cffi. Hashes com outros parâmetros são
+    # refeitos automaticamente no próximo login bem-sucedido.
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
+
+    # Pool de threads para hashing de senhas (bcrypt) fora do event loop
+    HASH_POOL_SIZE: int = 4
+    HASH_POOL_MAX_QUEUE: int = 64
+
+    # Limite de tentativas de login (token bucket por IP e por email).
+    # Backend "memory" é por processo; "sqlite" compartilha os buckets entre os workers do host.
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_BACKEND: str = "memory"
+    LOGIN_RATE_LIMIT_SQLITE_PATH: str = "login_rate_limit.sqlite3"
+    LOGIN_RATE_LIMIT_IP_CAPACITY: int = 20
+    LOGIN_RATE_LIMIT_IP_REFILL_PER_MINUTE: float = 10
+    LOGIN_RATE_LIMIT_EMAIL_CAPACITY: int = 5
+    LOGIN_RATE_LIMIT_EMAIL_REFILL_PER_MINUTE: float = 2
+
     INITIAL_ADMIN_NOME: str
     INITIAL_ADMIN_EMAIL: str
     INITIAL_ADMIN_SENHA: str
@@ -0,0 +1,103 @@
+"""
+Contagem e tempo das consultas SQL executadas por requisição.
+
+Os eventos de cursor do engine alimentam o `QueryStats` da requisição atual
+(guardado em um ContextVar pelo middleware em `app.main`). Em modo DEBUG os totais
+vão para os headers X-DB-Query-Count / X-DB-Query-Time-Ms.
+
+`query_budget` serve aos testes: falha quando um bloco executa mais consultas que o
+orçamento, o que pega regressões N+1 no CI:
+
+    with query_budget(6):
+        client.post(f"/professors/tccs/{tcc_id}/tarefas", data=..., headers=...)
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_seconds: float = 0.0
+    statements: List[str] = field(default_factory=list)
+    keep_statements: bool = False
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_seconds * 1000
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.total_seconds += elapsed
+        if self.keep_statements:
+            self.statements.append(statement)
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Orçamentos ativos em testes. São globais (não por contexto) porque o TestClient
+# executa a aplicação em outra thread.
+_budgets: List[QueryStats] = []
+_budgets_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if _budgets:
+        with _budgets_lock:
+            for budget in _budgets:
+                budget.record(statement, elapsed)
+
+
+def instrument_engine(sync_engine: Engine) -> None:
+    """
+    Registra os eventos de cursor no engine (use `async_engine.sync_engine`).
+    """
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Conta as consultas executadas no contexto atual (requisição ou tarefa asyncio).
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """
+    Falha com AssertionError se o bloco executar mais de `max_queries` consultas.
+    Pensado para testes, que rodam uma requisição por vez.
+    """
+    stats = QueryStats(keep_statements=True)
+    with _budgets_lock:
+        _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        with _budgets_lock:
+            _budgets.remove(stats)
+    if stats.count > max_queries:
+        executed = "\n".join(f"  {index}. {statement}" for index, statement in enumerate(stats.statements, 1))
+        raise AssertionError(f"Esperadas no máximo {max_queries} consultas, executadas {stats.count}:\n{executed}")
@@ -0,0 +1,194 @@
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+
+class InMemoryBucketStore:
+    """
+    Armazena os buckets na memória do processo. Cada worker tem seus próprios limites.
+
+    Os buckets ficam em ordem de último uso: os ociosos saem pela frente a cada
+    chamada e, acima de `max_keys`, o menos recente é descartado (LRU), sem varrer
+    o dicionário inteiro.
+    """
+
+    def __init__(self, max_keys: int = 100_000, idle_seconds: float = 3600):
+        self.max_keys = max_keys
+        self.idle_seconds = idle_seconds
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        """
+        Consome um token do bucket. Retorna 0 se permitido, ou os segundos até o próximo token.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                retry_after = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = (1 - tokens) / refill_per_second
+            self._buckets.move_to_end(key)
+            self._prune(now)
+            return retry_after
+
+    def _prune(self, now: float):
+        # Buckets ociosos há muito tempo já estariam cheios novamente
+        while self._buckets:
+            _, updated_at = next(iter(self._buckets.values()))
+            if now - updated_at < self.idle_seconds:
+                break
+            self._buckets.popitem(last=False)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+class SQLiteBucketStore:
+    """
+    Armazena os buckets em um arquivo SQLite local, compartilhado entre os workers
+    do mesmo host. Serve como substituto local de um backend como o Redis.
+
+    A cada `prune_interval` segundos, o worker apaga os buckets ociosos há mais de
+    `idle_seconds`, para o arquivo não crescer com toda chave já vista.
+    """
+
+    def __init__(self, path: str, idle_seconds: float = 3600, prune_interval: float = 60):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_buckets_updated_at ON buckets (updated_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        now = time.time()
+        conn = self._connect()
+        # BEGIN IMMEDIATE serializa a leitura-e-escrita do bucket entre processos
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_per_second)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / refill_per_second
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if now >= self._next_prune:
+            self._next_prune = now + self.prune_interval
+            self._prune(conn, now)
+        return retry_after
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        # Buckets ociosos há muito tempo já estariam cheios novamente
+        conn.execute("DELETE FROM buckets WHERE updated_at < ?", (now - self.idle_seconds,))
+
+
+class TokenBucketLimiter:
+    """
+    Limitador token-bucket: até `capacity` tentativas em rajada, repostas a
+    `refill_per_minute` por minuto.
+    """
+
+    def __init__(self, store, capacity: int, refill_per_minute: float):
+        self.store = store
+        self.capacity = capacity
+        self.refill_per_second = refill_per_minute / 60
+        self.allowed = 0
+        self.rejected = 0
+
+    async def hit(self, key: str) -> float:
+        if isinstance(self.store, SQLiteBucketStore):
+            retry_after = await asyncio.to_thread(self.store.take, key, self.capacity, self.refill_per_second)
+        else:
+            retry_after = self.store.take(key, self.capacity, self.refill_per_second)
+        if retry_after > 0:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "refill_per_minute": self.refill_per_second * 60,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+class LoginRateLimiter:
+    """
+    Limita tentativas de login por IP e por email antes de qualquer trabalho de bcrypt.
+    """
+
+    def __init__(self, store):
+        self.by_ip = TokenBucketLimiter(
+            store,
+            capacity=settings.LOGIN_RATE_LIMIT_IP_CAPACITY,
+            refill_per_minute=settings.LOGIN_RATE_LIMIT_IP_REFILL_PER_MINUTE,
+        )
+        self.by_email = TokenBucketLimiter(
+            store,
+            capacity=settings.LOGIN_RATE_LIMIT_EMAIL_CAPACITY,
+            refill_per_minute=settings.LOGIN_RATE_LIMIT_EMAIL_REFILL_PER_MINUTE,
+        )
+
+    async def check(self, ip: Optional[str], email: str) -> Optional[int]:
+        """
+        Retorna None se a tentativa é permitida, ou o valor de Retry-After em segundos.
+        """
+        retry_after = await self.by_ip.hit(f"login:ip:{ip or 'desconhecido'}")
+        if retry_after <= 0:
+            retry_after = await self.by_email.hit(f"login:email:{email.strip().lower()}")
+        if retry_after <= 0:
+            return None
+        return max(1, math.ceil(retry_after))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.LOGIN_RATE_LIMIT_ENABLED,
+            "backend": settings.LOGIN_RATE_LIMIT_BACKEND,
+            "by_ip": self.by_ip.stats(),
+            "by_email": self.by_email.stats(),
+        }
+
+
+def _create_store():
+    if settings.LOGIN_RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteBucketStore(settings.LOGIN_RATE_LIMIT_SQLITE_PATH)
+    return InMemoryBucketStore()
+
+
+login_rate_limiter = LoginRateLimiter(_create_store())
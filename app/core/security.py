@@ -1,10 +1,32 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from app.core.config import settings
-from typing import Optional
+from app.core.cache import token_cache
+from typing import Callable, List, Optional
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def _build_pwd_context() -> CryptContext:
+    # O esquema configurado é o padrão; bcrypt continua aceito para verificar hashes
+    # antigos, que passam a ser marcados como "precisa atualizar".
+    schemes = [settings.PASSWORD_HASH_SCHEME]
+    if settings.PASSWORD_HASH_SCHEME != "bcrypt":
+        schemes.append("bcrypt")
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        bcrypt__rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+        argon2__time_cost=settings.ARGON2_TIME_COST,
+        argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+        argon2__parallelism=settings.ARGON2_PARALLELISM,
+    )
+
+pwd_context = _build_pwd_context()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -12,6 +34,89 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    return pwd_context.needs_update(hashed_password)
+
+
+class HashingBusyError(Exception):
+    """Levantada quando a fila do pool de hashing está cheia."""
+
+
+class PasswordHasher:
+    """
+    Executa o hashing/verificação de senhas em um pool de threads limitado,
+    para não bloquear o event loop. O bcrypt libera o GIL, então threads bastam.
+    Quando há mais de `max_queue` operações aguardando, novas chamadas são
+    rejeitadas com HashingBusyError (backpressure) em vez de enfileiradas sem limite.
+    """
+
+    def __init__(self, pool_size: int, max_queue: int):
+        self.pool_size = pool_size
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="password-hash")
+        self.in_flight = 0
+        self.completed = 0
+        # Operações que levantaram exceção (ex.: hash armazenado inválido); não entram em `completed`
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.pool_size)
+
+    async def _run(self, func: Callable, *args):
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise HashingBusyError()
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+        Hash de vários passwords (ex.: importação em lote), no máximo `pool_size` por vez
+        para ocupar as threads sem encher a fila usada pelos logins.
+        """
+        hashes: List[str] = []
+        for start in range(0, len(passwords), self.pool_size):
+            chunk = passwords[start:start + self.pool_size]
+            hashes.extend(await asyncio.gather(*(self.hash(password) for password in chunk)))
+        return hashes
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(pool_size=settings.HASH_POOL_SIZE, max_queue=settings.HASH_POOL_MAX_QUEUE)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.hash(password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -23,8 +128,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 def decode_access_token(token: str) -> Optional[dict]:
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached_payload = token_cache.get(cache_key)
+    if cached_payload is not None:
+        return dict(cached_payload)
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    exp = payload.get("exp")
+    if exp is not None:
+        # A entrada expira no máximo junto com o token
+        token_cache.set(cache_key, payload, ttl=exp - time.time())
+    return dict(payload)
+
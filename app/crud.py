@@ -1,11 +1,56 @@
+from sqlalchemy import Row, case, insert, literal, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload, joinedload
 from app import models, schemas
-from app.core.security import get_password_hash
-from typing import Optional, List
+from app.core.security import get_password_hash_async
+from app.core.cache import (
+    CURSOS_NAMESPACE, PROFESSORES_NAMESPACE, principal_cache, response_cache, token_state_cache,
+)
+from app.database import run_after_commit
+from app.etag import embedded_version_columns, version_columns
+from app.fieldsets import FieldSelection
+from app.pagination import paginate
+from app.progress import ESCOPO_CURSO, ESCOPO_ORIENTADOR, ProgressDelta, apply_delta, drop_scope, removal_delta
+from app import search
+from typing import Iterable, Optional, List, Set, Tuple
 from datetime import datetime
 
+# As funções de escrita apenas fazem flush: o commit é feito uma vez por requisição em get_db.
+
+# Remove o usuário dos caches de autenticação depois que a escrita for confirmada
+def _invalidate_principal(db: AsyncSession, user: models.Professor | models.Estudante, email: Optional[str] = None):
+    user_type = "professor" if isinstance(user, models.Professor) else "estudante"
+    principal_key = (email or user.email, user_type)
+    token_state_key = (user_type, user.id)
+
+    def _invalidate():
+        principal_cache.invalidate(principal_key)
+        token_state_cache.invalidate(token_state_key)
+
+    run_after_commit(db, _invalidate)
+
+# Descarta as respostas em cache dos namespaces afetados depois que a escrita for confirmada
+def _invalidate_responses(db: AsyncSession, *namespaces: str):
+    def _invalidate():
+        for namespace in namespaces:
+            response_cache.invalidate(namespace)
+
+    run_after_commit(db, _invalidate)
+
+# Atualiza o índice de busca deste worker depois que a escrita for confirmada
+def _index_document(db: AsyncSession, obj: models.Estudante | models.Professor | models.TCC):
+    if isinstance(obj, models.Estudante):
+        document = search.estudante_document(obj.id, obj.nome, obj.matricula, obj.turma)
+    elif isinstance(obj, models.Professor):
+        document = search.professor_document(obj.id, obj.nome, obj.departamento)
+    else:
+        document = search.tcc_document(obj.id, obj.titulo, obj.descricao)
+    run_after_commit(db, lambda: search.search_index.upsert(document))
+
+def _unindex_document(db: AsyncSession, tipo: str, doc_id: int):
+    run_after_commit(db, lambda: search.search_index.remove(tipo, doc_id))
+
 # --- Estudante CRUD ---
 async def get_estudante_by_email(db: AsyncSession, email: str) -> Optional[models.Estudante]:
     result = await db.execute(select(models.Estudante).filter(models.Estudante.email == email))
@@ -20,7 +65,7 @@ async def get_estudante_by_id(db: AsyncSession, estudante_id: int) -> Optional[m
     return result.scalars().first()
 
 async def create_estudante(db: AsyncSession, estudante: schemas.EstudanteCreate) -> models.Estudante:
-    hashed_password = get_password_hash(estudante.password)
+    hashed_password = await get_password_hash_async(estudante.password)
     db_estudante = models.Estudante(
         nome=estudante.nome,
         email=estudante.email,
@@ -31,27 +76,57 @@ async def create_estudante(db: AsyncSession, estudante: schemas.EstudanteCreate)
         curso_id=estudante.curso_id 
     )
     db.add(db_estudante)
-    await db.commit()
-    await db.refresh(db_estudante)
+    await db.flush()
+    _index_document(db, db_estudante)
     return db_estudante
 
-async def get_estudantes(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Estudante]:
-    result = await db.execute(select(models.Estudante).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_estudantes(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    selection: Optional[FieldSelection] = None,
+) -> Tuple[List[models.Estudante], Optional[str]]:
+    query = select(models.Estudante)
+    if selection:
+        # A chave do cursor precisa estar carregada
+        query = query.options(*selection.query_options(models.Estudante.nome, models.Estudante.id))
+    return await paginate(
+        db, query, models.Estudante.nome, models.Estudante.id,
+        limit=limit, cursor=cursor, skip=skip,
+    )
 
 # NOVO: Função para deletar um estudante
 async def delete_estudante(db: AsyncSession, estudante: models.Estudante):
+    _invalidate_principal(db, estudante)
+    _unindex_document(db, search.TIPO_ESTUDANTE, estudante.id)
+    await apply_delta(db, await removal_delta(db, models.TCC.estudante_id == estudante.id))
     await db.delete(estudante)
-    await db.commit()
+    await db.flush()
 
 # NOVO: Função para arquivar (inativar) um estudante
 async def archive_estudante(db: AsyncSession, estudante: models.Estudante) -> models.Estudante:
     estudante.status = models.StatusEstudante.INATIVO
-    await db.commit()
-    await db.refresh(estudante)
+    # Revoga os tokens já emitidos para o estudante
+    estudante.token_version += 1
+    await db.flush()
+    _invalidate_principal(db, estudante)
     return estudante
 
 # NOVO: Função para buscar estudantes por curso e, opcionalmente, por turma
+async def get_progresso_contadores(db: AsyncSession, escopo_tipo: str, escopo_id: int) -> List[Row]:
+    """
+    (métrica, valor) de um escopo: leitura pelo prefixo da chave primária.
+    """
+    result = await db.execute(
+        select(models.ProgressoContador.metrica, models.ProgressoContador.valor).where(
+            models.ProgressoContador.escopo_tipo == escopo_tipo,
+            models.ProgressoContador.escopo_id == escopo_id,
+            models.ProgressoContador.valor != 0,
+        )
+    )
+    return result.all()
+
 async def get_estudantes_by_curso_and_turma(
     db: AsyncSession, curso_id: int, turma: Optional[str] = None
 ) -> List[models.Estudante]:
@@ -81,7 +156,7 @@ async def get_professor_by_id(db: AsyncSession, professor_id: int) -> Optional[m
     return result.scalars().first()
 
 async def create_professor(db: AsyncSession, professor: schemas.ProfessorCreate, role: models.UserRole = models.UserRole.PROFESSOR) -> models.Professor:
-    hashed_password = get_password_hash(professor.password)
+    hashed_password = await get_password_hash_async(professor.password)
     db_professor = models.Professor(
         nome=professor.nome,
         email=professor.email,
@@ -93,22 +168,41 @@ async def create_professor(db: AsyncSession, professor: schemas.ProfessorCreate,
         role=role 
     )
     db.add(db_professor)
-    await db.commit()
-    await db.refresh(db_professor)
+    await db.flush()
+    _index_document(db, db_professor)
+    _invalidate_responses(db, PROFESSORES_NAMESPACE)
     return db_professor
 
-async def get_professores(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Professor]:
-    result = await db.execute(select(models.Professor).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_professores(
+    db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Tuple[List[models.Professor], Optional[str]]:
+    return await paginate(
+        db, select(models.Professor), models.Professor.nome, models.Professor.id,
+        limit=limit, cursor=cursor, skip=skip,
+    )
 
 async def update_professor_role(db: AsyncSession, professor_id: int, new_role: models.UserRole) -> Optional[models.Professor]:
     db_professor = await get_professor_by_id(db, professor_id)
     if db_professor:
         db_professor.role = new_role
-        await db.commit()
-        await db.refresh(db_professor)
+        # O papel vai nos claims do token, então os tokens antigos deixam de valer
+        db_professor.token_version += 1
+        await db.flush()
+        _invalidate_principal(db, db_professor)
+        _invalidate_responses(db, PROFESSORES_NAMESPACE)
     return db_professor
 
+async def update_professor(db: AsyncSession, professor: models.Professor, professor_update: schemas.ProfessorUpdate) -> models.Professor:
+    email_anterior = professor.email
+    for field, value in professor_update.model_dump(exclude_unset=True).items():
+        setattr(professor, field, value)
+    await db.flush()
+    _invalidate_principal(db, professor, email=email_anterior)
+    _invalidate_principal(db, professor)
+    _index_document(db, professor)
+    _invalidate_responses(db, PROFESSORES_NAMESPACE)
+    return professor
+
 async def get_professores_by_departamento(db: AsyncSession, departamento: str):
     result = await db.execute(
         select(models.Professor).where(models.Professor.departamento == departamento)
@@ -117,16 +211,129 @@ async def get_professores_by_departamento(db: AsyncSession, departamento: str):
 
 # NOVO: Função para deletar um professor
 async def delete_professor(db: AsyncSession, professor: models.Professor):
+    _invalidate_principal(db, professor)
+    _unindex_document(db, search.TIPO_PROFESSOR, professor.id)
+    _invalidate_responses(db, PROFESSORES_NAMESPACE, CURSOS_NAMESPACE)
+    await apply_delta(db, await removal_delta(db, models.TCC.orientador_id == professor.id))
+    await drop_scope(db, ESCOPO_ORIENTADOR, professor.id)
     await db.delete(professor)
-    await db.commit()
+    await db.flush()
 
 # NOVO: Função para arquivar (inativar) um professor
 async def archive_professor(db: AsyncSession, professor: models.Professor) -> models.Professor:
     professor.status = models.StatusProfessor.INATIVO
-    await db.commit()
-    await db.refresh(professor)
+    professor.token_version += 1
+    await db.flush()
+    _invalidate_principal(db, professor)
+    _invalidate_responses(db, PROFESSORES_NAMESPACE)
     return professor
 
+# --- Login ---
+async def get_login_user_by_email(db: AsyncSession, email: str) -> Optional[Row]:
+    """
+    Resolve o email para o tipo de conta e os dados de login em uma única consulta
+    (UNION ALL entre professores e estudantes). Professores têm precedência.
+    """
+    professores = select(
+        models.Professor.id,
+        models.Professor.email,
+        models.Professor.hashed_password,
+        literal("professor").label("user_type"),
+        models.Professor.role.label("role"),
+        models.Professor.token_version,
+        literal(0).label("prioridade"),
+    ).where(models.Professor.email == email)
+    estudantes = select(
+        models.Estudante.id,
+        models.Estudante.email,
+        models.Estudante.hashed_password,
+        literal("estudante").label("user_type"),
+        literal(None, type_=models.Professor.role.type).label("role"),
+        models.Estudante.token_version,
+        literal(1).label("prioridade"),
+    ).where(models.Estudante.email == email)
+    query = union_all(professores, estudantes).order_by("prioridade").limit(1)
+    result = await db.execute(query)
+    return result.first()
+
+# --- Cadastro ---
+async def get_registration_conflicts(
+    db: AsyncSession,
+    email: str,
+    matricula: Optional[str] = None,
+    siape: Optional[str] = None,
+    curso_id: Optional[int] = None,
+) -> Set[str]:
+    """
+    Verifica em uma única consulta quais campos do cadastro já estão em uso.
+    Retorna um subconjunto de {"estudante_email", "professor_email", "matricula", "siape"},
+    mais "curso" quando `curso_id` existe.
+    """
+    checks = [
+        select(literal("estudante_email").label("campo")).where(models.Estudante.email == email),
+        select(literal("professor_email").label("campo")).where(models.Professor.email == email),
+    ]
+    if matricula is not None:
+        checks.append(select(literal("matricula").label("campo")).where(models.Estudante.matricula == matricula))
+    if siape is not None:
+        checks.append(select(literal("siape").label("campo")).where(models.Professor.siape == siape))
+    if curso_id is not None:
+        checks.append(select(literal("curso").label("campo")).where(models.Curso.id_curso == curso_id))
+    result = await db.execute(union_all(*checks))
+    return set(result.scalars().all())
+
+# --- Consultas em lote (importação) ---
+async def get_existing_emails(db: AsyncSession, emails: Iterable[str]) -> Set[str]:
+    """
+    Emails já usados por professores ou estudantes, em uma única consulta.
+    """
+    emails = list(emails)
+    if not emails:
+        return set()
+    query = union_all(
+        select(models.Professor.email).where(models.Professor.email.in_(emails)),
+        select(models.Estudante.email).where(models.Estudante.email.in_(emails)),
+    )
+    result = await db.execute(query)
+    return set(result.scalars().all())
+
+async def get_existing_values(db: AsyncSession, column, values: Iterable) -> Set:
+    """
+    Valores de `column` (ex.: Estudante.matricula, Curso.id_curso) que já existem no banco.
+    """
+    values = list(values)
+    if not values:
+        return set()
+    result = await db.execute(select(column).where(column.in_(values)))
+    return set(result.scalars().all())
+
+async def bulk_insert(db: AsyncSession, model, rows: List[dict]) -> None:
+    """
+    INSERT em lote (multi-row) sem carregar objetos na sessão.
+    """
+    if rows:
+        await db.execute(insert(model), rows)
+
+async def get_token_state(db: AsyncSession, user_type: str, user_id: int) -> Optional[Row]:
+    """
+    Consulta mínima (versão do token e status) usada para validar tokens sem carregar o usuário.
+    """
+    model = models.Professor if user_type == "professor" else models.Estudante
+    result = await db.execute(select(model.token_version, model.status).where(model.id == user_id))
+    return result.first()
+
+async def update_password_hash(db: AsyncSession, user_type: str, user_id: int, old_hash: str, new_hash: str) -> bool:
+    """
+    Troca o hash da senha somente se ele não mudou desde a leitura (compare-and-set).
+    """
+    model = models.Professor if user_type == "professor" else models.Estudante
+    result = await db.execute(
+        update(model)
+        .where(model.id == user_id, model.hashed_password == old_hash)
+        .values(hashed_password=new_hash)
+    )
+    return result.rowcount == 1
+
 # --- Curso CRUD ---
 async def get_curso_by_id(db: AsyncSession, curso_id: int) -> Optional[models.Curso]:
     result = await db.execute(select(models.Curso).filter(models.Curso.id_curso == curso_id))
@@ -139,8 +346,8 @@ async def get_curso_by_nome(db: AsyncSession, nome_curso: str) -> Optional[model
 async def create_curso(db: AsyncSession, curso: schemas.CursoCreate) -> models.Curso:
     db_curso = models.Curso(nome_curso=curso.nome_curso)
     db.add(db_curso)
-    await db.commit()
-    await db.refresh(db_curso)
+    await db.flush()
+    _invalidate_responses(db, CURSOS_NAMESPACE)
     return db_curso
 
 async def update_curso(db: AsyncSession, curso_id: int, curso_in: schemas.CursoUpdate) -> Optional[models.Curso]:
@@ -149,26 +356,50 @@ async def update_curso(db: AsyncSession, curso_id: int, curso_in: schemas.CursoU
         update_data = curso_in.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_curso, key, value)
-        await db.commit()
-        await db.refresh(db_curso)
+        await db.flush()
+        _invalidate_responses(db, CURSOS_NAMESPACE)
     return db_curso
 
-async def get_cursos(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(
-        select(models.Curso).options(joinedload(models.Curso.coordenador)).offset(skip).limit(limit)
+async def get_cursos(
+    db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Tuple[List[models.Curso], Optional[str]]:
+    return await paginate(
+        db, select(models.Curso).options(joinedload(models.Curso.coordenador)),
+        models.Curso.nome_curso, models.Curso.id_curso,
+        limit=limit, cursor=cursor, skip=skip,
     )
-    return result.scalars().all()
 
 async def assign_coordenador_to_curso(db: AsyncSession, curso_id: int, professor_id: int) -> Optional[models.Curso]:
     db_curso = await get_curso_by_id(db, curso_id)
     db_professor = await get_professor_by_id(db, professor_id)
     if not db_curso or not db_professor:
         return None
+    antigo_coordenador_id = db_curso.coordenador_id
     db_curso.coordenador_id = professor_id
-    await db.commit()
-    await db.refresh(db_curso)
+    await db.flush()
+    # O curso coordenado faz parte do snapshot do professor em cache: o novo e o
+    # antigo coordenador precisam ser recarregados
+    _invalidate_principal(db, db_professor)
+    await _invalidate_coordenador(db, antigo_coordenador_id, exceto=professor_id)
+    _invalidate_responses(db, CURSOS_NAMESPACE)
     return db_curso
 
+async def _invalidate_coordenador(db: AsyncSession, coordenador_id: Optional[int], exceto: Optional[int] = None):
+    if coordenador_id is None or coordenador_id == exceto:
+        return
+    coordenador = await get_professor_by_id(db, coordenador_id)
+    if coordenador:
+        _invalidate_principal(db, coordenador)
+
+async def delete_curso(db: AsyncSession, curso: models.Curso):
+    coordenador_id = curso.coordenador_id
+    # Os estudantes ficam sem curso, então o escopo do curso some dos contadores
+    await drop_scope(db, ESCOPO_CURSO, curso.id_curso)
+    await db.delete(curso)
+    await db.flush()
+    await _invalidate_coordenador(db, coordenador_id)
+    _invalidate_responses(db, CURSOS_NAMESPACE)
+
 # --- TCC CRUD ---
 async def create_tcc(db: AsyncSession, tcc_in: schemas.TCCCreate, orientador_id: int) -> models.TCC:
     db_tcc = models.TCC(
@@ -176,14 +407,27 @@ async def create_tcc(db: AsyncSession, tcc_in: schemas.TCCCreate, orientador_id:
         orientador_id=orientador_id
     )
     db.add(db_tcc)
-    await db.commit()
-    await db.refresh(db_tcc)
+    await db.flush()
+    delta = ProgressDelta()
+    delta.tcc(db_tcc.id, db_tcc.status)
+    await apply_delta(db, delta)
+    _index_document(db, db_tcc)
     return db_tcc
 
 async def get_tcc_by_id(db: AsyncSession, tcc_id: int) -> Optional[models.TCC]:
     result = await db.execute(select(models.TCC).options(selectinload(models.TCC.files)).filter(models.TCC.id == tcc_id))
     return result.scalars().first()
 
+async def get_owned_tcc_ids(db: AsyncSession, orientador_id: int, tcc_ids: Optional[List[int]] = None) -> List[int]:
+    """
+    IDs dos TCCs orientados pelo professor, opcionalmente restritos a `tcc_ids`, em uma consulta.
+    """
+    query = select(models.TCC.id).where(models.TCC.orientador_id == orientador_id)
+    if tcc_ids is not None:
+        query = query.where(models.TCC.id.in_(tcc_ids))
+    result = await db.execute(query.order_by(models.TCC.id))
+    return list(result.scalars().all())
+
 async def get_tccs_by_estudante_id(db: AsyncSession, estudante_id: int) -> List[models.TCC]:
     result = await db.execute(select(models.TCC).filter(models.TCC.estudante_id == estudante_id))
     return result.scalars().all()
@@ -193,16 +437,21 @@ async def get_tccs_by_orientador_id(db: AsyncSession, orientador_id: int) -> Lis
     return result.scalars().all()
 
 # --- Convite de Orientação CRUD ---
-async def create_convite_orientacao(db: AsyncSession, convite: schemas.ConviteOrientacaoCreate, professor_id: int) -> models.OrientacaoConvite:
+async def create_convite_orientacao(
+    db: AsyncSession,
+    convite: schemas.ConviteOrientacaoCreate,
+    professor: models.Professor,
+    estudante: models.Estudante,
+) -> models.OrientacaoConvite:
+    # Os relacionamentos já carregados dispensam uma nova consulta para montar a resposta
     db_convite = models.OrientacaoConvite(
         titulo_proposto=convite.titulo_proposto,
         descricao_proposta=convite.descricao_proposta,
-        estudante_id=convite.estudante_id,
-        professor_id=professor_id
+        estudante=estudante,
+        professor=professor
     )
     db.add(db_convite)
-    await db.commit()
-    await db.refresh(db_convite)
+    await db.flush()
     return db_convite
 
 async def get_convite_by_id(db: AsyncSession, convite_id: int) -> Optional[models.OrientacaoConvite]:
@@ -216,25 +465,44 @@ async def get_convite_by_id(db: AsyncSession, convite_id: int) -> Optional[model
     )
     return result.scalars().first()
 
-async def get_convites_by_estudante_id(db: AsyncSession, estudante_id: int) -> List[models.OrientacaoConvite]:
+async def get_convites_by_estudante_id(
+    db: AsyncSession, estudante_id: int, selection: Optional[FieldSelection] = None
+) -> List[models.OrientacaoConvite]:
+    if selection:
+        options = selection.query_options()
+    else:
+        options = [selectinload(models.OrientacaoConvite.professor), selectinload(models.OrientacaoConvite.estudante)]
     result = await db.execute(
         select(models.OrientacaoConvite)
-        .options(
-            selectinload(models.OrientacaoConvite.professor),
-            selectinload(models.OrientacaoConvite.estudante)
-        )
+        .options(*options)
         .where(models.OrientacaoConvite.estudante_id == estudante_id)
         .order_by(models.OrientacaoConvite.data_convite.desc())
     )
     return result.scalars().all()
 
-async def get_convites_by_professor_id(db: AsyncSession, professor_id: int) -> List[models.OrientacaoConvite]:
+async def get_convites_version_by_estudante_id(db: AsyncSession, estudante_id: int) -> Row:
     result = await db.execute(
-        select(models.OrientacaoConvite)
-        .options(
-            selectinload(models.OrientacaoConvite.professor),
-            selectinload(models.OrientacaoConvite.estudante)
+        select(
+            *version_columns(models.OrientacaoConvite),
+            *embedded_version_columns(models.Professor),
+            *embedded_version_columns(models.Estudante),
         )
+        .join(models.Professor, models.Professor.id == models.OrientacaoConvite.professor_id)
+        .join(models.Estudante, models.Estudante.id == models.OrientacaoConvite.estudante_id)
+        .where(models.OrientacaoConvite.estudante_id == estudante_id)
+    )
+    return result.one()
+
+async def get_convites_by_professor_id(
+    db: AsyncSession, professor_id: int, selection: Optional[FieldSelection] = None
+) -> List[models.OrientacaoConvite]:
+    if selection:
+        options = selection.query_options()
+    else:
+        options = [selectinload(models.OrientacaoConvite.professor), selectinload(models.OrientacaoConvite.estudante)]
+    result = await db.execute(
+        select(models.OrientacaoConvite)
+        .options(*options)
         .where(models.OrientacaoConvite.professor_id == professor_id)
         .order_by(models.OrientacaoConvite.data_convite.desc())
     )
@@ -244,8 +512,7 @@ async def update_convite_orientacao(db: AsyncSession, convite: models.Orientacao
     convite.status = update_data.status
     convite.data_resposta = datetime.utcnow()
     db.add(convite)
-    await db.commit()
-    await db.refresh(convite)
+    await db.flush()
     return convite
 
 async def get_pending_convite_for_estudante(db: AsyncSession, estudante_id: int) -> Optional[models.OrientacaoConvite]:
@@ -261,8 +528,7 @@ async def get_pending_convite_for_estudante(db: AsyncSession, estudante_id: int)
 async def create_tcc_file(db: AsyncSession, tcc_file_in: schemas.TCCFileCreate) -> models.TCCFile:
     db_tcc_file = models.TCCFile(**tcc_file_in.model_dump())
     db.add(db_tcc_file)
-    await db.commit()
-    await db.refresh(db_tcc_file)
+    await db.flush()
     return db_tcc_file
 
 async def get_tcc_files_by_tcc_id(db: AsyncSession, tcc_id: int) -> List[models.TCCFile]:
@@ -282,21 +548,59 @@ async def create_arquivo(db: AsyncSession, arquivo: schemas.ArquivoCreate, taref
         tarefa_id=tarefa_id
     )
     db.add(db_arquivo)
-    await db.commit()
-    await db.refresh(db_arquivo)
+    # Os arquivos fazem parte da resposta da tarefa: muda a versão dela (ETag)
+    await db.execute(
+        update(models.Tarefa).where(models.Tarefa.id == tarefa_id).values(updated_at=datetime.utcnow())
+    )
+    await db.flush()
     return db_arquivo
 
 # --- Tarefa CRUD ---
-async def create_tarefa(db: AsyncSession, tarefa: schemas.TarefaCreate, tcc_id: int) -> models.Tarefa:
+async def create_tarefa(
+    db: AsyncSession,
+    tarefa: schemas.TarefaCreate,
+    tcc_id: int,
+    arquivos: Optional[List[schemas.ArquivoCreate]] = None,
+) -> models.Tarefa:
     db_tarefa = models.Tarefa(
         **tarefa.model_dump(),
         tcc_id=tcc_id,
-        status=models.StatusTarefa.A_FAZER
+        status=models.StatusTarefa.A_FAZER,
+        arquivos=[models.Arquivo(**arquivo.model_dump()) for arquivo in arquivos or []]
     )
     db.add(db_tarefa)
-    await db.commit()
-    await db.refresh(db_tarefa)
-    return await get_tarefa_by_id(db, db_tarefa.id)
+    await db.flush()
+    delta = ProgressDelta()
+    delta.tarefa(tcc_id, db_tarefa.status, db_tarefa.data_entrega)
+    await apply_delta(db, delta)
+    return db_tarefa
+
+async def create_tarefas_for_tccs(
+    db: AsyncSession,
+    tarefa: schemas.TarefaCreate,
+    tcc_ids: List[int],
+    arquivo: Optional[schemas.ArquivoCreate] = None,
+) -> List[models.Tarefa]:
+    """
+    Cria a mesma tarefa em vários TCCs em um único flush (INSERTs em lote).
+    O anexo é gravado uma vez no disco e cada tarefa recebe um Arquivo apontando para ele.
+    """
+    tarefas = [
+        models.Tarefa(
+            **tarefa.model_dump(),
+            tcc_id=tcc_id,
+            status=models.StatusTarefa.A_FAZER,
+            arquivos=[models.Arquivo(**arquivo.model_dump())] if arquivo else []
+        )
+        for tcc_id in tcc_ids
+    ]
+    db.add_all(tarefas)
+    await db.flush()
+    delta = ProgressDelta()
+    for db_tarefa in tarefas:
+        delta.tarefa(db_tarefa.tcc_id, db_tarefa.status, db_tarefa.data_entrega)
+    await apply_delta(db, delta)
+    return tarefas
 
 async def get_tarefa_by_id(db: AsyncSession, tarefa_id: int) -> Optional[models.Tarefa]:
     result = await db.execute(
@@ -309,42 +613,133 @@ async def get_tarefa_by_id(db: AsyncSession, tarefa_id: int) -> Optional[models.
     )
     return result.scalars().first()
 
-async def get_tarefas_by_tcc_id(db: AsyncSession, tcc_id: int) -> List[models.Tarefa]:
+async def get_tcc_tarefas_version(db: AsyncSession, tcc_id: int) -> Optional[Row]:
+    """
+    Donos do TCC (para a checagem de acesso) e a versão da lista de tarefas, em uma consulta.
+    None se o TCC não existe.
+    """
+    result = await db.execute(
+        select(models.TCC.estudante_id, models.TCC.orientador_id, *version_columns(models.Tarefa))
+        .outerjoin(models.Tarefa, models.Tarefa.tcc_id == models.TCC.id)
+        .where(models.TCC.id == tcc_id)
+        .group_by(models.TCC.id, models.TCC.estudante_id, models.TCC.orientador_id)
+    )
+    return result.first()
+
+async def get_tarefas_by_tcc_id(
+    db: AsyncSession, tcc_id: int, selection: Optional[FieldSelection] = None
+) -> List[models.Tarefa]:
+    options = selection.query_options() if selection else [selectinload(models.Tarefa.arquivos)]
     result = await db.execute(
-        select(models.Tarefa).options(selectinload(models.Tarefa.arquivos)).where(models.Tarefa.tcc_id == tcc_id)
+        select(models.Tarefa).options(*options).where(models.Tarefa.tcc_id == tcc_id)
     )
     return result.scalars().all()
 
+async def _lock_tarefa(db: AsyncSession, tarefa: models.Tarefa):
+    # O delta dos contadores parte do status atual, relido sob lock: o lido sem lock no
+    # início da requisição pode já ter sido mudado por uma transição concorrente
+    await db.refresh(tarefa, attribute_names=["tcc_id", "status", "data_entrega"], with_for_update=True)
+
 async def update_tarefa(db: AsyncSession, tarefa: models.Tarefa, tarefa_update: schemas.TarefaUpdate) -> models.Tarefa:
     update_data = tarefa_update.model_dump(exclude_unset=True)
+    await _lock_tarefa(db, tarefa)
+    delta = ProgressDelta()
+    delta.tarefa(tarefa.tcc_id, tarefa.status, tarefa.data_entrega, sign=-1)
     for key, value in update_data.items():
         setattr(tarefa, key, value)
+    delta.tarefa(tarefa.tcc_id, tarefa.status, tarefa.data_entrega)
     db.add(tarefa)
-    await db.commit()
-    await db.refresh(tarefa)
-    return await get_tarefa_by_id(db, tarefa.id)
+    await db.flush()
+    await apply_delta(db, delta)
+    return tarefa
+
+async def get_tarefas_access(db: AsyncSession, tarefa_ids: List[int]) -> List[Row]:
+    """
+    (id, orientador_id, estudante_id) de cada tarefa, via join com o TCC, em uma consulta.
+    Tarefas inexistentes não aparecem no resultado.
+    """
+    result = await db.execute(
+        select(models.Tarefa.id, models.TCC.orientador_id, models.TCC.estudante_id)
+        .join(models.TCC, models.Tarefa.tcc_id == models.TCC.id)
+        .where(models.Tarefa.id.in_(tarefa_ids))
+    )
+    return result.all()
+
+async def update_tarefas_status(db: AsyncSession, status_by_id: dict) -> List[models.Tarefa]:
+    """
+    Aplica todas as transições com um único UPDATE (CASE por id) e devolve as tarefas atualizadas.
+    """
+    tarefa_ids = list(status_by_id)
+    # Lock nas linhas (em ordem de id) até o commit: o delta parte do status atual
+    atuais = await db.execute(
+        select(models.Tarefa.id, models.Tarefa.tcc_id, models.Tarefa.status, models.Tarefa.data_entrega)
+        .where(models.Tarefa.id.in_(tarefa_ids))
+        .order_by(models.Tarefa.id)
+        .with_for_update()
+    )
+    delta = ProgressDelta()
+    for tarefa_id, tcc_id, status_atual, data_entrega in atuais.all():
+        delta.tarefa(tcc_id, status_atual, data_entrega, sign=-1)
+        delta.tarefa(tcc_id, status_by_id[tarefa_id], data_entrega)
+    await db.execute(
+        update(models.Tarefa)
+        .where(models.Tarefa.id.in_(tarefa_ids))
+        # Literais tipados para que o Enum seja gravado como no restante do ORM
+        .values(status=case(
+            {tarefa_id: literal(novo_status, models.Tarefa.status.type) for tarefa_id, novo_status in status_by_id.items()},
+            value=models.Tarefa.id,
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    await apply_delta(db, delta)
+    result = await db.execute(
+        select(models.Tarefa)
+        .options(selectinload(models.Tarefa.arquivos))
+        .where(models.Tarefa.id.in_(tarefa_ids))
+        .order_by(models.Tarefa.id)
+        .execution_options(populate_existing=True)
+    )
+    return list(result.scalars().all())
 
 async def delete_tarefa(db: AsyncSession, tarefa: models.Tarefa) -> bool:
     if tarefa:
+        await _lock_tarefa(db, tarefa)
+        delta = ProgressDelta()
+        delta.tarefa(tarefa.tcc_id, tarefa.status, tarefa.data_entrega, sign=-1)
         await db.delete(tarefa)
-        await db.commit()
+        await db.flush()
+        await apply_delta(db, delta)
         return True
     return False
 
 # --- Admin Arquivo CRUD ---
-async def create_admin_arquivo(db: AsyncSession, arquivo_in: schemas.AdminArquivoCreate) -> models.AdminArquivo:
+async def create_admin_arquivo(
+    db: AsyncSession,
+    arquivo_in: schemas.AdminArquivoCreate,
+    uploader: Optional[models.Professor] = None,
+) -> models.AdminArquivo:
     db_arquivo = models.AdminArquivo(**arquivo_in.model_dump())
+    if uploader is not None:
+        db_arquivo.uploader = uploader
     db.add(db_arquivo)
-    await db.commit()
-    await db.refresh(db_arquivo)
-    return await db.get(models.AdminArquivo, db_arquivo.id, options=[selectinload(models.AdminArquivo.uploader)])
+    await db.flush()
+    if uploader is None:
+        await db.refresh(db_arquivo, attribute_names=["uploader"])
+    return db_arquivo
 
-async def get_admin_arquivos(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.AdminArquivo]:
+async def get_admin_arquivos_version(db: AsyncSession) -> Row:
     result = await db.execute(
-        select(models.AdminArquivo)
-        .options(selectinload(models.AdminArquivo.uploader))
-        .offset(skip)
-        .limit(limit)
-        .order_by(models.AdminArquivo.data_upload.desc())
+        select(*version_columns(models.AdminArquivo), *embedded_version_columns(models.Professor))
+        .join(models.Professor, models.Professor.id == models.AdminArquivo.uploader_id)
     )
-    return result.scalars().all()
\ No newline at end of file
+    return result.one()
+
+async def get_admin_arquivos(
+    db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Tuple[List[models.AdminArquivo], Optional[str]]:
+    # Mais recentes primeiro
+    return await paginate(
+        db, select(models.AdminArquivo).options(selectinload(models.AdminArquivo.uploader)),
+        models.AdminArquivo.data_upload, models.AdminArquivo.id,
+        limit=limit, cursor=cursor, skip=skip, descending=True,
+    )
\ No newline at end of file
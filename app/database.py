@@ -1,49 +1,240 @@
 import asyncio
+import itertools
+import random
+import time
+from typing import Callable
+from fastapi import Request
+from sqlalchemy import Delete, Insert, Update, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core.query_stats import instrument_engine
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_async_engine(DATABASE_URL, echo=True) # echo=True for debugging SQL
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Pool padrão do SQLAlchemy que também mede o tempo de espera no checkout de conexões.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+
+def _engine_options(url: str) -> dict:
+    options = {"echo": settings.DB_ECHO, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    parsed_url = make_url(url)
+    # SQLite em memória usa um pool próprio (StaticPool); os demais usam o pool configurável
+    if parsed_url.get_backend_name() == "sqlite" and parsed_url.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+# expire_on_commit=False: os objetos continuam utilizáveis após o commit, sem SELECTs extras
 AsyncSessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
+    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession, expire_on_commit=False
+)
+
+REPLICA_URLS = [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+replica_engines = [create_async_engine(url, **_engine_options(url)) for url in REPLICA_URLS]
+_replica_cycle = itertools.cycle(replica_engines)
+
+for _engine in (engine, *replica_engines):
+    instrument_engine(_engine.sync_engine)
+
+# Cookie que mantém o cliente no primário logo após uma escrita (read-your-writes)
+PRIMARY_STICKY_COOKIE = "db_primary_until"
+
+
+class RoutingSession(Session):
+    """
+    Sessão que envia leituras para uma réplica (round-robin, uma por sessão)
+    e escritas para o primário. Depois da primeira escrita da requisição,
+    todas as consultas seguintes também vão para o primário.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._replica = next(_replica_cycle).sync_engine if replica_engines else None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["use_primary"] = True
+        request_state = self.info.get("request_state")
+        wrote_in_request = request_state is not None and getattr(request_state, "db_wrote", False)
+        if self._replica is None or self.info.get("use_primary") or wrote_in_request:
+            return engine.sync_engine
+        return self._replica
+
+
+ReadSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False
 )
 
+
+def reads_from_primary_after_write(db: AsyncSession) -> bool:
+    """
+    True quando a sessão de leitura está presa ao primário por uma escrita recente
+    do cliente. Respostas lidas assim não devem passar pelo cache compartilhado, que
+    pode ter sido preenchido a partir de uma réplica atrasada.
+    """
+    return bool(replica_engines) and bool(db.info.get("use_primary"))
+
+
+def run_after_commit(db: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Agenda `callback` para depois do próximo commit da sessão (ex.: invalidar caches).
+    Descartado se a transação for revertida.
+    """
+    db.sync_session.info.setdefault("after_commit_callbacks", []).append(callback)
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session):
+    for callback in session.info.pop("after_commit_callbacks", []):
+        callback()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit_callbacks(session):
+    session.info.pop("after_commit_callbacks", None)
+
+
+def _mark_request_write(session: Session) -> None:
+    request_state = session.info.get("request_state")
+    if request_state is not None:
+        request_state.db_wrote = True
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    _mark_request_write(session)
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_request_write(orm_execute_state.session)
+
+
 Base = declarative_base()
 
-async def get_db():
+async def get_db(request: Request):
+    """
+    Sessão por requisição (unit of work): as funções de `crud` apenas fazem flush e
+    o único commit acontece aqui, quando o handler termina sem erro. Use sempre
+    com `Depends(get_db, scope="function")`, para que o commit ocorra antes do envio da resposta.
+    """
     async with AsyncSessionLocal() as session:
+        session.info["request_state"] = request.state
         yield session
+        await session.commit()
+
+async def get_read_db(request: Request):
+    """
+    Sessão para dependências somente leitura: usa as réplicas quando configuradas,
+    exceto logo após uma escrita do mesmo cliente ou da mesma requisição.
+    """
+    async with ReadSessionLocal() as session:
+        session.info["request_state"] = request.state
+        primary_until = request.cookies.get(PRIMARY_STICKY_COOKIE, "")
+        if primary_until.isdigit() and int(primary_until) > time.time():
+            session.info["use_primary"] = True
+        yield session
+        await session.commit()
+
+def get_pool_status() -> dict:
+    """
+    Estado atual do pool de conexões do engine principal.
+    """
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            timeout_seconds=pool.timeout(),
+        )
+    if isinstance(pool, TimedQueuePool):
+        status.update(
+            checkouts=pool.checkouts,
+            total_wait_ms=round(pool.total_wait * 1000, 3),
+            avg_wait_ms=round(pool.total_wait * 1000 / pool.checkouts, 3) if pool.checkouts else 0.0,
+            max_wait_ms=round(pool.max_wait * 1000, 3),
+        )
+    return status
 
-MAX_DB_RETRIES = 5
-DB_RETRY_DELAY_SECONDS = 5
+def _retry_delay(attempt: int) -> float:
+    # Backoff exponencial com jitter, para que vários workers não tentem ao mesmo tempo
+    delay = min(settings.DB_STARTUP_BACKOFF_MAX_SECONDS, settings.DB_STARTUP_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
 
 async def init_db():
+    # Importação local: app.migrations depende de app.models, que depende deste módulo
+    from app.migrations import LATEST_VERSION, get_schema_version, upgrade_schema
+
     retries = 0
     while True:
         try:
+            # Uma consulta basta quando o schema já está atualizado: sem reflexão nem DDL
+            async with engine.connect() as conn:
+                current_version = await conn.run_sync(get_schema_version)
+            if current_version == LATEST_VERSION:
+                print(f"INFO:     Schema do banco na versão {current_version}; inicialização de tabelas ignorada.")
+                break
+
             async with engine.begin() as conn:
                 # await conn.run_sync(Base.metadata.drop_all) # Use with caution
-                await conn.run_sync(Base.metadata.create_all)
+                applied = await conn.run_sync(upgrade_schema)
             print(f"INFO:     Conexão com o banco de dados '{settings.DATABASE_URL.split('@')[-1]}' estabelecida e tabelas inicializadas.")
+            if applied:
+                print(f"INFO:     Migrações aplicadas: {', '.join(map(str, applied))}")
             break  # Sucesso
+        except IntegrityError as e:
+            # Outro worker registrou a mesma migração primeiro: na próxima volta o schema já está atualizado
+            retries += 1
+            if retries > settings.DB_STARTUP_MAX_RETRIES:
+                raise
+            print(f"AVISO:    Migrações aplicadas por outro processo ao mesmo tempo; verificando novamente. ({e.orig})")
         except OperationalError as e:
             retries += 1
-            error_message_lower = str(e).lower()
             # Extrai o host e a porta da DATABASE_URL para a mensagem de log
             db_address_info = "desconhecido"
             if '@' in settings.DATABASE_URL:
                 db_address_info = settings.DATABASE_URL.split('@')[-1].split('/')[0]
 
-            if retries > MAX_DB_RETRIES:
-                print(f"ERRO:     Falha ao conectar ao banco de dados em '{db_address_info}' após {MAX_DB_RETRIES} tentativas. Desistindo.")
+            if retries > settings.DB_STARTUP_MAX_RETRIES:
+                print(f"ERRO:     Falha ao conectar ao banco de dados em '{db_address_info}' após {settings.DB_STARTUP_MAX_RETRIES} tentativas. Desistindo.")
                 raise
             
-            print(f"AVISO:    Falha na conexão com o banco de dados em '{db_address_info}'. Tentando novamente em {DB_RETRY_DELAY_SECONDS}s... (Tentativa {retries}/{MAX_DB_RETRIES})")
+            delay = _retry_delay(retries)
+            print(f"AVISO:    Falha na conexão com o banco de dados em '{db_address_info}'. Tentando novamente em {delay:.1f}s... (Tentativa {retries}/{settings.DB_STARTUP_MAX_RETRIES})")
             print(f"          Detalhes do erro: {e}")
-            await asyncio.sleep(DB_RETRY_DELAY_SECONDS)
+            await asyncio.sleep(delay)
         except Exception as e:
             print(f"ERRO:     Um erro inesperado ocorreu durante a inicialização do banco de dados: {e}")
             raise
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""
+ETags para GETs de listas consultadas em polling.
+
+A versão de uma lista vem de uma consulta agregada sobre as linhas do escopo
+(quantidade, soma dos ids, soma de `versao` e maior `updated_at`), que usa os
+mesmos índices do filtro e não carrega nem serializa as linhas. `versao` é
+incrementada em todo UPDATE, então qualquer inserção, remoção ou alteração muda
+a agregação. Se o `If-None-Match` do cliente bate com a versão atual, a resposta
+é 304 sem corpo.
+
+Os objetos aninhados vindos de outras tabelas (ex.: o professor de um convite) entram
+na mesma consulta por join, com `embedded_version_columns`: como `versao` só cresce,
+a soma muda sempre que um deles é alterado, mesmo que apareça em várias linhas.
+"""
+import hashlib
+from typing import Optional, Sequence
+
+from fastapi import Request, Response, status
+from sqlalchemy import func
+
+# Mude quando o formato das respostas mudar, para invalidar as ETags já emitidas
+ETAG_FORMAT_VERSION = 1
+
+
+def version_columns(model) -> list:
+    return [
+        func.count(model.id),
+        func.coalesce(func.sum(model.id), 0),
+        func.coalesce(func.sum(model.versao), 0),
+        func.max(model.updated_at),
+    ]
+
+
+def embedded_version_columns(model) -> list:
+    """
+    Colunas de versão de uma relação embutida na resposta (join com a tabela listada).
+    """
+    return [
+        func.coalesce(func.sum(model.versao), 0),
+        func.max(model.updated_at),
+    ]
+
+
+def make_etag(scope: str, version: Sequence) -> str:
+    """
+    ETag forte para a resposta de `scope` (rota + parâmetros + usuário, quando a lista depende dele).
+    """
+    raw = "|".join([str(ETAG_FORMAT_VERSION), scope, *(str(value) for value in version)])
+    return '"' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match usa comparação fraca: W/"x" casa com "x"
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    Resposta 304 se o cliente já tem a versão `etag`; None caso contrário.
+    """
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
@@ -0,0 +1,106 @@
+"""
+Exportação de tabelas em CSV ou NDJSON via streaming.
+
+As linhas são lidas com cursor no servidor (`AsyncSession.stream` + `yield_per`) e
+codificadas lote a lote, então a memória usada não depende do tamanho da tabela.
+Cada exportação usa a própria sessão (réplica de leitura, se configurada), pois a
+resposta continua sendo enviada depois que as dependências da requisição terminam.
+"""
+import csv
+import enum
+import io
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, List
+
+from sqlalchemy import select
+
+from app import models
+from app.database import ReadSessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+
+# Colunas exportadas por entidade; senhas e tokens nunca saem
+EXPORT_COLUMNS: Dict[str, List] = {
+    "students": [
+        models.Estudante.id,
+        models.Estudante.nome,
+        models.Estudante.email,
+        models.Estudante.matricula,
+        models.Estudante.turma,
+        models.Estudante.curso_id,
+        models.Estudante.status,
+        models.Estudante.telefone,
+    ],
+    "professors": [
+        models.Professor.id,
+        models.Professor.nome,
+        models.Professor.email,
+        models.Professor.siape,
+        models.Professor.departamento,
+        models.Professor.titulacao,
+        models.Professor.role,
+        models.Professor.status,
+        models.Professor.telefone,
+    ],
+    "tccs": [
+        models.TCC.id,
+        models.TCC.titulo,
+        models.TCC.status,
+        models.TCC.estudante_id,
+        models.TCC.orientador_id,
+    ],
+    "tarefas": [
+        models.Tarefa.id,
+        models.Tarefa.tcc_id,
+        models.Tarefa.titulo,
+        models.Tarefa.status,
+        models.Tarefa.data_entrega,
+    ],
+}
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(header: List[str], rows, first: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if first:
+        writer.writerow(header)
+    writer.writerows([_plain(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(header: List[str], rows, first: bool) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(header, (_plain(value) for value in row))), ensure_ascii=False) + "\n"
+        for row in rows
+    ).encode()
+
+
+async def stream_export(entidade: str, formato: str) -> AsyncIterator[bytes]:
+    """
+    Gera o arquivo de exportação em pedaços de até EXPORT_BATCH_SIZE linhas.
+    """
+    columns = EXPORT_COLUMNS[entidade]
+    header = [column.key for column in columns]
+    encode = _encode_csv if formato == "csv" else _encode_ndjson
+    query = select(*columns).order_by(columns[0]).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    async with ReadSessionLocal() as db:
+        result = await db.stream(query)
+        first = True
+        async for partition in result.partitions():
+            yield encode(header, partition, first)
+            first = False
+        if first:
+            # Tabela vazia: no CSV, só o cabeçalho
+            yield encode(header, [], first)
@@ -0,0 +1,104 @@
+"""
+Respostas parciais (sparse fieldsets) com `?fields=` e `?include=`.
+
+- `fields`: campos do schema que devem voltar (ex.: `fields=id,titulo,status`);
+- `include`: objetos aninhados que devem voltar (ex.: `include=arquivos`).
+  Relações também podem ser pedidas direto em `fields`.
+
+Sem nenhum dos dois a resposta continua completa. Com `fields`, as relações não
+citadas ficam de fora; com apenas `include`, voltam todos os campos simples e só
+as relações citadas. A seleção vira `load_only` das colunas pedidas e
+`selectinload` apenas das relações pedidas, então o banco também lê menos. A
+resposta é serializada com um schema parcial derivado do schema público
+(compilado uma vez por combinação de campos).
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Tuple, Type
+
+from fastapi import Response
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+
+
+class InvalidFieldsError(ValueError):
+    pass
+
+
+def _split(value: Optional[str]) -> FrozenSet[str]:
+    return frozenset(part.strip() for part in (value or "").split(",") if part.strip())
+
+
+@lru_cache(maxsize=256)
+def _partial_adapter(schema: Type[BaseModel], fields: Tuple[str, ...]) -> TypeAdapter:
+    partial = create_model(
+        f"{schema.__name__}Parcial",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields},
+    )
+    return TypeAdapter(list[partial])
+
+
+@dataclass(frozen=True)
+class FieldSelection:
+    schema: Type[BaseModel]
+    model: type
+    # Na ordem do schema, relações incluídas
+    fields: Tuple[str, ...]
+    relations: FrozenSet[str]
+
+    @property
+    def scope(self) -> str:
+        """
+        Identifica a seleção (ex.: na chave da ETag).
+        """
+        return ",".join(self.fields)
+
+    def query_options(self, *required_columns) -> list:
+        """
+        Opções de carga para a consulta. `required_columns` são colunas usadas pelo
+        próprio getter (ex.: chave de ordenação da paginação) mesmo que não sejam pedidas.
+        """
+        mapper = inspect(self.model)
+        columns = {mapper.attrs[name].class_attribute for name in self.fields if name not in self.relations}
+        columns.update(required_columns)
+        options = []
+        for name in self.relations:
+            relationship = mapper.relationships[name]
+            # Chaves estrangeiras das quais o carregamento da relação depende
+            columns.update(
+                mapper.get_property_by_column(column).class_attribute
+                for column in relationship.local_columns
+                if column in mapper.columns.values()
+            )
+            options.append(selectinload(relationship.class_attribute))
+        return [load_only(*columns), *options]
+
+    def response(self, data, headers: Optional[Dict[str, str]] = None) -> Response:
+        adapter = _partial_adapter(self.schema, self.fields)
+        body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+def parse_fieldset(
+    schema: Type[BaseModel], model: type, fields: Optional[str], include: Optional[str]
+) -> Optional[FieldSelection]:
+    """
+    Valida `fields`/`include` contra o schema. None quando a resposta completa foi pedida.
+    """
+    requested, included = _split(fields), _split(include)
+    if not requested and not included:
+        return None
+    mapper = inspect(model)
+    relations = {name for name in schema.model_fields if name in mapper.relationships}
+    unknown = (requested - set(schema.model_fields)) | (included - relations)
+    if unknown:
+        raise InvalidFieldsError(f"Campos inválidos: {', '.join(sorted(unknown))}.")
+    chosen_relations = (requested & relations) | included
+    if requested:
+        chosen = requested | included
+    else:
+        chosen = (set(schema.model_fields) - relations) | included
+    ordered = tuple(name for name in schema.model_fields if name in chosen)
+    return FieldSelection(schema, model, ordered, frozenset(chosen_relations))
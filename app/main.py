@@ -1,11 +1,18 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import time
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from fastapi.middleware.cors import CORSMiddleware
 
 # Importações principais que não causam ciclos
-from app.database import init_db, AsyncSessionLocal
-from app.routers import auth_router, student_router, professor_router, admin_router, tarefa_router
+from app.database import init_db, AsyncSessionLocal, PRIMARY_STICKY_COOKIE, replica_engines
+from app.routers import auth_router, student_router, professor_router, admin_router, tarefa_router, search_router
 from app.core.config import settings
+from app.core.security import HashingBusyError
+from app.core.query_stats import track_queries
+from app.fieldsets import InvalidFieldsError
+from app.pagination import InvalidCursorError, NEXT_CURSOR_HEADER
 from app import models, schemas # crud foi removido daqui
 
 app = FastAPI(title="Sistema de Gestão Acadêmica API", version="0.1.0")
@@ -16,25 +23,84 @@ app.add_middleware(
        allow_credentials=True,
        allow_methods=["*"],
        allow_headers=["*"],
+       expose_headers=[NEXT_CURSOR_HEADER],
    )
 
 
+@app.exception_handler(HashingBusyError)
+async def hashing_busy_handler(request: Request, exc: HashingBusyError):
+    # Backpressure do pool de hashing: o cliente deve tentar novamente em instantes
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Servidor sobrecarregado, tente novamente em instantes."},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorError):
+    return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(exc)})
+
+@app.exception_handler(InvalidFieldsError)
+async def invalid_fields_handler(request: Request, exc: InvalidFieldsError):
+    return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(exc)})
+
+@app.middleware("http")
+async def replica_stickiness(request: Request, call_next):
+    # Após uma escrita, o cliente passa a ler do primário por alguns segundos
+    response = await call_next(request)
+    if replica_engines and getattr(request.state, "db_wrote", False):
+        primary_until = int(time.time()) + settings.REPLICA_STICKY_SECONDS
+        response.set_cookie(
+            PRIMARY_STICKY_COOKIE,
+            str(primary_until),
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
+@app.middleware("http")
+async def query_stats(request: Request, call_next):
+    # Conta as consultas SQL da requisição (inclui o commit feito em get_db)
+    with track_queries() as stats:
+        response = await call_next(request)
+    if settings.DEBUG:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Query-Time-Ms"] = f"{stats.total_ms:.1f}"
+    if settings.DEBUG or stats.count > settings.QUERY_COUNT_WARN_THRESHOLD:
+        nivel = "INFO:    " if stats.count <= settings.QUERY_COUNT_WARN_THRESHOLD else "AVISO:   "
+        print(
+            f"{nivel} {request.method} {request.url.path} -> {response.status_code}: "
+            f"{stats.count} consultas SQL em {stats.total_ms:.1f}ms"
+        )
+    return response
+
 # Include routers
 app.include_router(auth_router.router)
 app.include_router(student_router.router)
 app.include_router(professor_router.router)
 app.include_router(admin_router.router)
 app.include_router(tarefa_router.router)
+app.include_router(search_router.router)
 
-@app.on_event("startup")
-async def on_startup():
-    await init_db() # Create tables
-
+async def seed_initial_admin():
+    """
+    Cria o administrador inicial uma única vez por deploy. O primeiro worker a gravar
+    o marcador em app_markers executa o seed; os demais (e os próximos boots) pulam.
+    """
     # Importação local de 'crud' para quebrar o ciclo de dependência
     from app import crud
-    
-    # Create initial Admin Professor if not exists
+    from app.migrations import app_markers
+
+    marker = f"admin_seed:{settings.DEPLOYMENT_ID or settings.INITIAL_ADMIN_EMAIL}"
     async with AsyncSessionLocal() as db:
+        try:
+            await db.execute(app_markers.insert().values(name=marker))
+        except IntegrityError:
+            print(f"INFO:     Seed do administrador já executado ('{marker}').")
+            return
+
+        # Create initial Admin Professor if not exists
         try:
             admin_user = await crud.get_professor_by_email(db, email=settings.INITIAL_ADMIN_EMAIL)
             if not admin_user:
@@ -48,13 +114,29 @@ async def on_startup():
                     role=models.UserRole.ADMIN # Explicitly set role here for creation
                 )
                 await crud.create_professor(db, professor=admin_in, role=models.UserRole.ADMIN) # Pass role explicitly
+                await db.commit()
                 print(f"INFO:     Usuário administrador '{settings.INITIAL_ADMIN_EMAIL}' criado.")
             else:
+                # Grava o marcador mesmo quando o admin já existe
+                await db.commit()
                 print(f"INFO:     Usuário administrador '{settings.INITIAL_ADMIN_EMAIL}' já existe.")
         except Exception as e:
             # Imprime o erro específico que ocorre na criação do admin
             print(f"ERRO:     Ocorreu um erro durante a criação do usuário administrador inicial: {e}")
 
+@app.on_event("startup")
+async def on_startup():
+    db_start = time.perf_counter()
+    await init_db() # Create tables
+    seed_start = time.perf_counter()
+    await seed_initial_admin()
+    seed_end = time.perf_counter()
+
+    print(
+        f"INFO:     Tempo de inicialização: banco pronto {seed_start - db_start:.2f}s, "
+        f"seed {seed_end - seed_start:.2f}s (total {seed_end - db_start:.2f}s)"
+    )
+
 
 @app.get("/", tags=["Root"])
 async def read_root():
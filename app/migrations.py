@@ -0,0 +1,207 @@
+"""
+Migrações de schema versionadas.
+
+`Base.metadata.create_all` só cria tabelas que não existem; ele não adiciona colunas
+nem índices a tabelas já criadas. Cada migração abaixo leva um banco existente até
+o schema atual dos models e é registrada na tabela `schema_migrations`.
+As operações são idempotentes, então também podem rodar sobre um banco recém-criado.
+
+Vários workers podem subir ao mesmo tempo: `upgrade_schema` segura um lock no banco
+(GET_LOCK no MySQL, advisory lock no PostgreSQL) enquanto cria as tabelas e aplica as
+migrações, e quem chega depois encontra as versões já registradas.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateColumn
+
+from app import models
+from app.progress import rebuild_counters
+
+migrations_metadata = MetaData()
+
+MIGRATION_LOCK_NAME = "apiprint2_schema_migrations"
+# Chave numérica do advisory lock do PostgreSQL
+MIGRATION_LOCK_KEY = 72_0011
+MIGRATION_LOCK_TIMEOUT_SECONDS = 300
+
+schema_migrations = Table(
+    "schema_migrations",
+    migrations_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+# Marcadores de tarefas que devem rodar uma única vez por deploy (ex.: seed do admin)
+app_markers = Table(
+    "app_markers",
+    migrations_metadata,
+    Column("name", String(191), primary_key=True),
+    Column("created_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+# --- Utilitários ---
+def _add_column_if_missing(conn: Connection, model, column_name: str) -> None:
+    table = model.__table__
+    existing = {col["name"] for col in inspect(conn).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column_ddl = CreateColumn(table.c[column_name]).compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+
+def _add_change_tracking(conn: Connection, *tracked_models) -> None:
+    for model in tracked_models:
+        _add_column_if_missing(conn, model, "versao")
+        _add_column_if_missing(conn, model, "updated_at")
+        table = model.__table__
+        conn.execute(table.update().where(table.c.updated_at.is_(None)).values(updated_at=datetime.utcnow()))
+
+
+def _create_indexes_if_missing(conn: Connection, model, *index_names: str) -> None:
+    indexes = {index.name: index for index in model.__table__.indexes}
+    for name in index_names:
+        indexes[name].create(conn, checkfirst=True)
+
+
+# --- Migrações ---
+def _0001_token_version(conn: Connection) -> None:
+    _add_column_if_missing(conn, models.Professor, "token_version")
+    _add_column_if_missing(conn, models.Estudante, "token_version")
+
+
+def _0002_hot_filter_indexes(conn: Connection) -> None:
+    _create_indexes_if_missing(conn, models.TCC, "ix_tccs_estudante_id", "ix_tccs_orientador_id")
+    _create_indexes_if_missing(conn, models.Tarefa, "ix_tarefas_tcc_id")
+    _create_indexes_if_missing(
+        conn,
+        models.OrientacaoConvite,
+        "ix_orientacao_convites_estudante_status",
+        "ix_orientacao_convites_professor_data",
+    )
+    _create_indexes_if_missing(conn, models.Estudante, "ix_estudantes_curso_turma_nome")
+    _create_indexes_if_missing(conn, models.Professor, "ix_professores_departamento")
+    _create_indexes_if_missing(conn, models.AdminArquivo, "ix_admin_arquivos_data_upload")
+
+
+def _0003_app_markers(conn: Connection) -> None:
+    app_markers.create(conn, checkfirst=True)
+
+
+def _0004_keyset_pagination_indexes(conn: Connection) -> None:
+    _create_indexes_if_missing(conn, models.Estudante, "ix_estudantes_nome_id")
+    _create_indexes_if_missing(conn, models.Professor, "ix_professores_nome_id")
+    _create_indexes_if_missing(conn, models.AdminArquivo, "ix_admin_arquivos_data_upload_id")
+
+
+def _0005_progress_counters(conn: Connection) -> None:
+    models.ProgressoContador.__table__.create(conn, checkfirst=True)
+    rebuild_counters(conn)
+
+
+def _0006_change_tracking(conn: Connection) -> None:
+    _add_change_tracking(conn, models.TCC, models.Tarefa, models.OrientacaoConvite, models.AdminArquivo)
+
+
+def _0007_user_change_tracking(conn: Connection) -> None:
+    # Professores e estudantes vão aninhados nas listas com ETag (convites, arquivos gerais)
+    _add_change_tracking(conn, models.Professor, models.Estudante)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Coluna token_version em professores e estudantes", _0001_token_version),
+    Migration(2, "Índices para os filtros mais usados (TCC, tarefas, convites, estudantes)", _0002_hot_filter_indexes),
+    Migration(3, "Tabela app_markers para tarefas únicas por deploy", _0003_app_markers),
+    Migration(4, "Índices (chave, id) para paginação por cursor", _0004_keyset_pagination_indexes),
+    Migration(5, "Contadores de progresso por orientador e curso (com backfill)", _0005_progress_counters),
+    Migration(6, "Colunas versao/updated_at para ETags (TCC, tarefas, convites, arquivos gerais)", _0006_change_tracking),
+    Migration(7, "Colunas versao/updated_at em professores e estudantes (ETags)", _0007_user_change_tracking),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(conn: Connection) -> Optional[int]:
+    """
+    Versão atual do schema em uma única consulta; None se o banco ainda não foi inicializado.
+    """
+    try:
+        return conn.execute(select(func.max(schema_migrations.c.version))).scalar()
+    except (OperationalError, ProgrammingError):
+        # Tabela schema_migrations inexistente
+        return None
+
+
+@contextmanager
+def migration_lock(conn: Connection) -> Iterator[None]:
+    """
+    Lock exclusivo entre processos durante as migrações. No SQLite não há lock: um
+    worker que perde a corrida recebe "tabela já existe" ou versão duplicada e o
+    `init_db` tenta de novo, já encontrando o schema atualizado.
+    """
+    dialect_name = conn.dialect.name
+    if dialect_name == "mysql":
+        # Lock de sessão: sobrevive aos commits implícitos do DDL
+        acquired = conn.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"),
+            {"name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT_SECONDS},
+        ).scalar()
+        if acquired != 1:
+            raise TimeoutError(f"Lock de migração '{MIGRATION_LOCK_NAME}' não obtido em {MIGRATION_LOCK_TIMEOUT_SECONDS}s.")
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+    elif dialect_name == "postgresql":
+        # Liberado no fim da transação
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        yield
+    else:
+        yield
+
+
+def upgrade_schema(conn: Connection) -> List[int]:
+    """
+    Cria as tabelas que faltam e aplica as migrações pendentes, segurando o lock de
+    migração. Retorna as versões aplicadas por este processo.
+    """
+    with migration_lock(conn):
+        models.Base.metadata.create_all(conn)
+        return run_migrations(conn)
+
+
+def run_migrations(conn: Connection) -> List[int]:
+    """
+    Aplica, em ordem, as migrações ainda não registradas. Retorna as versões aplicadas.
+    Deve ser chamada com `conn.run_sync` dentro de uma transação.
+    """
+    schema_migrations.create(conn, checkfirst=True)
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    newly_applied = []
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        migration.upgrade(conn)
+        conn.execute(
+            schema_migrations.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow(),
+            )
+        )
+        newly_applied.append(migration.version)
+    return newly_applied
@@ -1,11 +1,19 @@
 # models.py
 
-from sqlalchemy import Column, Integer, String, Enum as SAEnum, ForeignKey, DateTime, Text, Date
+from sqlalchemy import Column, Integer, String, Enum as SAEnum, ForeignKey, DateTime, Text, Date, Index, literal_column
 from sqlalchemy.orm import relationship
 from app.database import Base
 import enum
 from datetime import datetime
 
+# Rastreamento de alterações para ETags (ver app/etag.py). Também vale para UPDATEs em lote
+# do Core, que aplicam o `onupdate` das colunas ausentes do SET.
+def _versao_column():
+    return Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("versao + 1"))
+
+def _updated_at_column():
+    return Column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class UserRole(str, enum.Enum):
     PROFESSOR = "professor"
     COORDENADOR = "coordenador"
@@ -44,16 +52,26 @@ class Professor(Base):
     email = Column(String(100), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     siape = Column(String(50), unique=True, index=True, nullable=False)
-    departamento = Column(String(100))
+    departamento = Column(String(100), index=True)
     titulacao = Column(String(100))
     telefone = Column(String(20), nullable=True)
     role = Column(SAEnum(UserRole), default=UserRole.PROFESSOR, nullable=False)
     # NOVO: Campo de status para o professor
     status = Column(SAEnum(StatusProfessor), default=StatusProfessor.ATIVO, nullable=False)
+    # Incrementado quando tokens já emitidos devem deixar de valer (arquivamento, troca de papel)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
+    # Professores aparecem aninhados em convites e arquivos gerais: entram na ETag dessas listas
+    versao = _versao_column()
+    updated_at = _updated_at_column()
     curso_coordenado = relationship("Curso", back_populates="coordenador", uselist=False)
     tccs_orientados = relationship("TCC", back_populates="orientador", foreign_keys="[TCC.orientador_id]")
     convites_enviados = relationship("OrientacaoConvite", back_populates="professor", foreign_keys="[OrientacaoConvite.professor_id]")
 
+    __table_args__ = (
+        # Paginação por cursor ordenada por nome
+        Index("ix_professores_nome_id", "nome", "id"),
+    )
+
 
 class Estudante(Base):
     __tablename__ = "estudantes"
@@ -63,13 +81,23 @@ class Estudante(Base):
     hashed_password = Column(String(255), nullable=False)
     matricula = Column(String(50), unique=True, index=True, nullable=False)
     status = Column(SAEnum(StatusEstudante), default=StatusEstudante.ATIVO)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
     turma = Column(String(50))
     telefone = Column(String(20), nullable=True)
     curso_id = Column(Integer, ForeignKey("cursos.id_curso"))
+    versao = _versao_column()
+    updated_at = _updated_at_column()
     curso = relationship("Curso", back_populates="estudantes")
     tccs = relationship("TCC", back_populates="estudante", foreign_keys="[TCC.estudante_id]")
     convites_recebidos = relationship("OrientacaoConvite", back_populates="estudante", foreign_keys="[OrientacaoConvite.estudante_id]")
 
+    __table_args__ = (
+        # Listagem de alunos do coordenador: filtra por curso/turma e ordena por nome
+        Index("ix_estudantes_curso_turma_nome", "curso_id", "turma", "nome"),
+        # Paginação por cursor ordenada por nome
+        Index("ix_estudantes_nome_id", "nome", "id"),
+    )
+
 class OrientacaoConvite(Base):
     __tablename__ = "orientacao_convites"
     id = Column(Integer, primary_key=True, index=True)
@@ -80,9 +108,16 @@ class OrientacaoConvite(Base):
     data_resposta = Column(DateTime, nullable=True)
     professor_id = Column(Integer, ForeignKey("professores.id"), nullable=False)
     estudante_id = Column(Integer, ForeignKey("estudantes.id"), nullable=False)
+    versao = _versao_column()
+    updated_at = _updated_at_column()
     professor = relationship("Professor", back_populates="convites_enviados")
     estudante = relationship("Estudante", back_populates="convites_recebidos")
 
+    __table_args__ = (
+        Index("ix_orientacao_convites_estudante_status", "estudante_id", "status"),
+        Index("ix_orientacao_convites_professor_data", "professor_id", "data_convite"),
+    )
+
 
 class Curso(Base):
     __tablename__ = "cursos"
@@ -98,8 +133,10 @@ class TCC(Base):
     titulo = Column(String(255), nullable=False)
     descricao = Column(Text, nullable=True)
     status = Column(SAEnum(StatusTCC), default=StatusTCC.EM_ANDAMENTO, nullable=False)
-    estudante_id = Column(Integer, ForeignKey("estudantes.id"), nullable=False)
-    orientador_id = Column(Integer, ForeignKey("professores.id"), nullable=False)
+    estudante_id = Column(Integer, ForeignKey("estudantes.id"), nullable=False, index=True)
+    orientador_id = Column(Integer, ForeignKey("professores.id"), nullable=False, index=True)
+    versao = _versao_column()
+    updated_at = _updated_at_column()
     estudante = relationship("Estudante", back_populates="tccs", foreign_keys=[estudante_id])
     orientador = relationship("Professor", back_populates="tccs_orientados", foreign_keys=[orientador_id])
     files = relationship("TCCFile", back_populates="tcc", cascade="all, delete-orphan")
@@ -112,7 +149,9 @@ class Tarefa(Base):
     descricao = Column(Text, nullable=True)
     data_entrega = Column(Date, nullable=True)
     status = Column(SAEnum(StatusTarefa), default=StatusTarefa.A_FAZER, nullable=False)
-    tcc_id = Column(Integer, ForeignKey("tccs.id"), nullable=False)
+    tcc_id = Column(Integer, ForeignKey("tccs.id"), nullable=False, index=True)
+    versao = _versao_column()
+    updated_at = _updated_at_column()
     tcc = relationship("TCC", back_populates="tarefas")
     arquivos = relationship("Arquivo", back_populates="tarefa", cascade="all, delete-orphan")
 
@@ -141,6 +180,27 @@ class AdminArquivo(Base):
     nome_arquivo = Column(String(255), nullable=False)
     caminho_arquivo = Column(String(512), nullable=False)
     descricao = Column(Text, nullable=True)
-    data_upload = Column(DateTime, default=datetime.utcnow, nullable=False)
+    data_upload = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     uploader_id = Column(Integer, ForeignKey("professores.id"), nullable=False)
-    uploader = relationship("Professor")
\ No newline at end of file
+    versao = _versao_column()
+    updated_at = _updated_at_column()
+    uploader = relationship("Professor")
+
+    __table_args__ = (
+        # Paginação por cursor, mais recentes primeiro
+        Index("ix_admin_arquivos_data_upload_id", "data_upload", "id"),
+    )
+
+
+class ProgressoContador(Base):
+    """
+    Contadores de progresso mantidos incrementalmente pelas escritas em `crud`
+    (ver app/progress.py). Escopo: 'orientador' (id do professor) ou 'curso' (id do curso).
+    Métricas: 'tarefa:<status>', 'tcc:<status>' e 'prazo:<AAAA-MM-DD>' (tarefas em aberto
+    com entrega naquela data).
+    """
+    __tablename__ = "progresso_contadores"
+    escopo_tipo = Column(String(20), primary_key=True)
+    escopo_id = Column(Integer, primary_key=True, autoincrement=False)
+    metrica = Column(String(40), primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,82 @@
+"""
+Paginação por cursor (keyset).
+
+Em vez de OFFSET, cada página continua a partir da última linha da anterior com
+`(chave, id) > (ultima_chave, ultimo_id)`, o que usa o índice composto
+(chave, id) e mantém o custo por página constante em qualquer profundidade.
+A comparação por row value é intencional: a forma expandida com OR não é
+convertida em busca no índice pelo SQLite quando os valores vêm como parâmetros.
+O cursor é opaco para o cliente: base64 de [ultima_chave, ultimo_id].
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Header com o cursor da próxima página; ausente na última página
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"dt": sort_value.isoformat()}
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["dt"])
+        if not isinstance(row_id, int):
+            raise TypeError(row_id)
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursorError("Cursor de paginação inválido.") from e
+    return sort_value, row_id
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    sort_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    skip: int = 0,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Executa `query` ordenada por (sort_column, id_column) a partir do cursor.
+    Retorna os itens da página e o cursor da próxima (None na última página).
+    `skip` (OFFSET) é mantido para clientes antigos e ignorado quando há cursor.
+    """
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        if descending:
+            query = query.where(tuple_(sort_column, id_column) < tuple_(last_value, last_id))
+        else:
+            query = query.where(tuple_(sort_column, id_column) > tuple_(last_value, last_id))
+    elif skip:
+        query = query.offset(skip)
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+
+    # Uma linha a mais indica se existe próxima página
+    result = await db.execute(query.limit(limit + 1))
+    items = list(result.scalars().all())
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
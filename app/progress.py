@@ -0,0 +1,200 @@
+"""
+Contadores de progresso por orientador e por curso (tabela progresso_contadores).
+
+As funções de escrita do `crud` registram a variação de cada métrica em um
+`ProgressDelta` e chamam `apply_delta`, que resolve os escopos dos TCCs afetados
+em uma consulta e aplica todos os incrementos com um único upsert. Os painéis
+leem apenas as linhas do escopo (prefixo da chave primária).
+
+Métricas:
+- 'tarefa:<status>' e 'tcc:<status>': quantidade por status;
+- 'prazo:<AAAA-MM-DD>': tarefas ainda em aberto com entrega naquela data. As
+  atrasadas são a soma das datas anteriores a hoje, o que dispensa qualquer job diário.
+
+Transições cobertas: criação, alteração e remoção de tarefas; criação de TCCs; remoção
+de estudantes, professores e cursos. Não há delta para a troca de `curso_id` de um
+estudante, a troca de orientador nem a mudança de status de um TCC, que hoje nenhuma
+rota faz: quem passar a fazê-las deve registrar o delta no `crud` ou, numa alteração
+feita fora da aplicação, rodar `rebuild_counters` depois.
+"""
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, schemas
+
+ESCOPO_ORIENTADOR = "orientador"
+ESCOPO_CURSO = "curso"
+
+# Tarefas entregues não contam como atrasadas
+FINISHED_TAREFA_STATUSES = {models.StatusTarefa.FEITA, models.StatusTarefa.CONCLUIDA}
+
+
+def tarefa_metrics(status: models.StatusTarefa, data_entrega: Optional[date]) -> List[str]:
+    metrics = [f"tarefa:{models.StatusTarefa(status).value}"]
+    if data_entrega is not None and status not in FINISHED_TAREFA_STATUSES:
+        metrics.append(f"prazo:{data_entrega.isoformat()}")
+    return metrics
+
+
+def tcc_metrics(status: models.StatusTCC) -> List[str]:
+    return [f"tcc:{models.StatusTCC(status).value}"]
+
+
+class ProgressDelta:
+    """
+    Variações acumuladas por (tcc_id, métrica) durante uma escrita.
+    """
+
+    def __init__(self):
+        self.by_tcc: Counter = Counter()
+
+    def tarefa(self, tcc_id: int, status, data_entrega: Optional[date], sign: int = 1) -> None:
+        for metric in tarefa_metrics(status, data_entrega):
+            self.by_tcc[(tcc_id, metric)] += sign
+
+    def tcc(self, tcc_id: int, status, sign: int = 1) -> None:
+        for metric in tcc_metrics(status):
+            self.by_tcc[(tcc_id, metric)] += sign
+
+
+def _scope_columns():
+    return [(ESCOPO_ORIENTADOR, models.TCC.orientador_id), (ESCOPO_CURSO, models.Estudante.curso_id)]
+
+
+def _increment_statement(dialect_name: str):
+    table = models.ProgressoContador.__table__
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        return stmt.on_duplicate_key_update(valor=table.c.valor + stmt.inserted.valor)
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.escopo_tipo, table.c.escopo_id, table.c.metrica],
+        set_={"valor": table.c.valor + stmt.excluded.valor},
+    )
+
+
+async def apply_delta(db: AsyncSession, delta: ProgressDelta) -> None:
+    """
+    Aplica as variações nos contadores de orientador e curso de cada TCC afetado.
+    Deve ser chamada depois do flush das linhas correspondentes.
+    """
+    changes = {key: value for key, value in delta.by_tcc.items() if value}
+    if not changes:
+        return
+    tcc_ids = {tcc_id for tcc_id, _ in changes}
+    result = await db.execute(
+        select(models.TCC.id, *(column for _, column in _scope_columns()))
+        .join(models.Estudante, models.TCC.estudante_id == models.Estudante.id)
+        .where(models.TCC.id.in_(tcc_ids))
+    )
+    scopes: Dict[int, List[Tuple[str, int]]] = {}
+    for tcc_id, *scope_ids in result.all():
+        scopes[tcc_id] = [
+            (escopo_tipo, escopo_id)
+            for (escopo_tipo, _), escopo_id in zip(_scope_columns(), scope_ids)
+            if escopo_id is not None
+        ]
+
+    counters: Counter = Counter()
+    for (tcc_id, metric), value in changes.items():
+        for escopo_tipo, escopo_id in scopes.get(tcc_id, []):
+            counters[(escopo_tipo, escopo_id, metric)] += value
+    rows = [
+        {"escopo_tipo": escopo_tipo, "escopo_id": escopo_id, "metrica": metric, "valor": value}
+        for (escopo_tipo, escopo_id, metric), value in counters.items()
+        if value
+    ]
+    if rows:
+        await db.execute(_increment_statement(db.get_bind().dialect.name), rows)
+
+
+async def removal_delta(db: AsyncSession, *criteria) -> ProgressDelta:
+    """
+    Variações que tiram dos contadores os TCCs que satisfazem `criteria` e suas tarefas.
+    Aplique antes do flush da remoção: depois dele os escopos já não podem ser resolvidos.
+    """
+    delta = ProgressDelta()
+    tccs = await db.execute(select(models.TCC.id, models.TCC.status).where(*criteria))
+    for tcc_id, status in tccs.all():
+        delta.tcc(tcc_id, status, sign=-1)
+    tarefas = await db.execute(
+        select(models.Tarefa.tcc_id, models.Tarefa.status, models.Tarefa.data_entrega)
+        .join(models.TCC, models.Tarefa.tcc_id == models.TCC.id)
+        .where(*criteria)
+    )
+    for tcc_id, status, data_entrega in tarefas.all():
+        delta.tarefa(tcc_id, status, data_entrega, sign=-1)
+    return delta
+
+
+async def drop_scope(db: AsyncSession, escopo_tipo: str, escopo_id: int) -> None:
+    """
+    Remove os contadores de um escopo que deixou de existir (ex.: curso removido).
+    """
+    table = models.ProgressoContador.__table__
+    await db.execute(
+        table.delete().where(table.c.escopo_tipo == escopo_tipo, table.c.escopo_id == escopo_id)
+    )
+
+
+def rebuild_counters(conn: Connection) -> None:
+    """
+    Recalcula todos os contadores a partir de tccs/tarefas (backfill e correção manual).
+    """
+    counters: Counter = Counter()
+    for escopo_tipo, scope_column in _scope_columns():
+        tarefas = conn.execute(
+            select(scope_column, models.Tarefa.status, models.Tarefa.data_entrega, func.count(models.Tarefa.id))
+            .join(models.TCC, models.Tarefa.tcc_id == models.TCC.id)
+            .join(models.Estudante, models.TCC.estudante_id == models.Estudante.id)
+            .where(scope_column.is_not(None))
+            .group_by(scope_column, models.Tarefa.status, models.Tarefa.data_entrega)
+        )
+        for escopo_id, status, data_entrega, total in tarefas:
+            for metric in tarefa_metrics(status, data_entrega):
+                counters[(escopo_tipo, escopo_id, metric)] += total
+        tccs = conn.execute(
+            select(scope_column, models.TCC.status, func.count(models.TCC.id))
+            .join(models.Estudante, models.TCC.estudante_id == models.Estudante.id)
+            .where(scope_column.is_not(None))
+            .group_by(scope_column, models.TCC.status)
+        )
+        for escopo_id, status, total in tccs:
+            for metric in tcc_metrics(status):
+                counters[(escopo_tipo, escopo_id, metric)] += total
+
+    table = models.ProgressoContador.__table__
+    conn.execute(table.delete())
+    rows = [
+        {"escopo_tipo": escopo_tipo, "escopo_id": escopo_id, "metrica": metric, "valor": value}
+        for (escopo_tipo, escopo_id, metric), value in counters.items()
+    ]
+    if rows:
+        conn.execute(table.insert(), rows)
+
+
+def build_painel(rows: Iterable[Tuple[str, int]], hoje: date) -> schemas.PainelProgresso:
+    tarefas = {status: 0 for status in models.StatusTarefa}
+    tccs = {status: 0 for status in models.StatusTCC}
+    atrasadas = 0
+    for metric, value in rows:
+        kind, _, key = metric.partition(":")
+        if kind == "tarefa":
+            tarefas[models.StatusTarefa(key)] = value
+        elif kind == "tcc":
+            tccs[models.StatusTCC(key)] = value
+        elif kind == "prazo" and date.fromisoformat(key) < hoje:
+            atrasadas += value
+    return schemas.PainelProgresso(
+        tarefas_por_status=tarefas, tccs_por_status=tccs, tarefas_atrasadas=atrasadas
+    )
@@ -1,41 +1,127 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, File, UploadFile, Form
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import List, Literal, Optional
 from app import schemas, crud, models, auth
-from app.database import get_db
+from app.bulk_import import ImportFormatError, detect_format, import_users
+from app.exports import MEDIA_TYPES, stream_export
+from app.database import get_db, get_read_db, get_pool_status, reads_from_primary_after_write
+from app.core.cache import CURSOS_NAMESPACE, principal_cache, response_cache, token_cache
+from app.core.security import password_hasher
+from app.core.rate_limit import login_rate_limiter
+from app.fieldsets import parse_fieldset
+from app.pagination import NEXT_CURSOR_HEADER
+from app.search import search_index
 import uuid
 from pathlib import Path
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 UPLOAD_DIR = Path("uploads/admin_arquivos")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+CURSOS_ADAPTER = TypeAdapter(List[schemas.CursoPublic])
 
 
 @router.get("/users/students", response_model=List[schemas.EstudantePublic])
 async def list_students(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
-    students = await crud.get_estudantes(db, skip=skip, limit=limit)
+    selection = parse_fieldset(schemas.EstudantePublic, models.Estudante, fields, None)
+    students, next_cursor = await crud.get_estudantes(
+        db, skip=skip, limit=limit, cursor=cursor, selection=selection
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if selection:
+        return selection.response(students, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
     return students
 
 @router.get("/users/professors", response_model=List[schemas.ProfessorPublic])
 async def list_professors(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
-    professors = await crud.get_professores(db, skip=skip, limit=limit)
+    professors, next_cursor = await crud.get_professores(db, skip=skip, limit=limit, cursor=cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return professors
 
+@router.post("/users/{user_type}/import", response_model=schemas.ImportacaoResultado)
+async def bulk_import_users(
+    user_type: Literal["students", "professors"],
+    file: UploadFile = File(...),
+    formato: Optional[Literal["csv", "jsonl"]] = Query(None, description="Padrão: pela extensão do arquivo."),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    current_admin: models.Professor = Depends(auth.get_current_admin_user)
+):
+    """
+    Importa estudantes ou professores em lote a partir de CSV (com cabeçalho) ou JSONL.
+    Os campos são os mesmos do cadastro individual. Linhas inválidas ou duplicadas
+    são ignoradas e listadas em `erros`; as demais são gravadas.
+    """
+    try:
+        return await import_users(db, file, user_type, detect_format(file.filename, formato))
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/export/{entidade}")
+async def export_table(
+    entidade: Literal["students", "professors", "tccs", "tarefas"],
+    formato: Literal["csv", "ndjson"] = "csv",
+    current_admin: models.Professor = Depends(auth.get_current_admin_user)
+):
+    """
+    Exporta a tabela inteira em CSV ou NDJSON, enviada em streaming à medida que
+    as linhas são lidas do banco (memória constante, independente do tamanho).
+    """
+    extensao = "csv" if formato == "csv" else "ndjson"
+    return StreamingResponse(
+        stream_export(entidade, formato),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{entidade}.{extensao}"'},
+    )
+
+@router.get("/metrics")
+async def get_metrics(
+    current_admin: models.Professor = Depends(auth.get_current_admin_user)
+):
+    """
+    Métricas internas do processo atual (caches, filas e afins).
+    """
+    return {
+        "principal_cache": principal_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "login_rate_limit": login_rate_limiter.stats(),
+        "db_pool": get_pool_status(),
+        "search_index": search_index.stats(),
+    }
+
+@router.get("/metrics/db-pool")
+async def get_db_pool_metrics(
+    current_admin: models.Professor = Depends(auth.get_current_admin_user)
+):
+    """
+    Conexões em uso e ociosas, overflow e tempo de espera do pool do banco.
+    """
+    return get_pool_status()
+
 # NOVO: Endpoint para excluir permanentemente um estudante
 @router.delete("/users/student/{student_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_student_user(
     student_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
     student_to_delete = await crud.get_estudante_by_id(db, student_id)
@@ -48,7 +134,7 @@ async def delete_student_user(
 @router.patch("/users/student/{student_id}/archive", response_model=schemas.EstudantePublic)
 async def archive_student_user(
     student_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
     student_to_archive = await crud.get_estudante_by_id(db, student_id)
@@ -60,7 +146,7 @@ async def archive_student_user(
 @router.delete("/users/professor/{professor_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_professor_user(
     professor_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
     professor_to_delete = await crud.get_professor_by_id(db, professor_id)
@@ -73,7 +159,7 @@ async def delete_professor_user(
 @router.patch("/users/professor/{professor_id}/archive", response_model=schemas.ProfessorPublic)
 async def archive_professor_user(
     professor_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
     professor_to_archive = await crud.get_professor_by_id(db, professor_id)
@@ -84,7 +170,7 @@ async def archive_professor_user(
 @router.post("/cursos", response_model=schemas.CursoPublic, status_code=status.HTTP_201_CREATED)
 async def create_new_curso(
     curso_in: schemas.CursoCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
     db_curso = await crud.get_curso_by_nome(db, nome_curso=curso_in.nome_curso)
@@ -96,7 +182,7 @@ async def create_new_curso(
 async def assign_coordenador(
     curso_id: int,
     professor_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
     professor_to_assign = await crud.get_professor_by_id(db, professor_id)
@@ -119,17 +205,24 @@ async def assign_coordenador(
 @router.get("/cursos", response_model=List[schemas.CursoPublic])
 async def list_all_cursos(
     skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db, scope="function"),
 ):
-    cursos = await crud.get_cursos(db, skip=skip, limit=limit)
-    return cursos
+    # Resposta serializada em cache; invalidada pelas escritas em cursos
+    cache_key = response_cache.key(CURSOS_NAMESPACE, (skip, limit, cursor), bypass=reads_from_primary_after_write(db))
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    cursos, next_cursor = await crud.get_cursos(db, skip=skip, limit=limit, cursor=cursor)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return response_cache.store(cache_key, CURSOS_ADAPTER, cursos, headers)
 
 @router.put("/cursos/{curso_id}", response_model=schemas.CursoPublic)
 async def update_curso(
     curso_id: int,
     curso_in: schemas.CursoCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
     db_curso = await crud.get_curso_by_id(db, curso_id)
@@ -140,19 +233,18 @@ async def update_curso(
 @router.delete("/cursos/{curso_id}", status_code=204)
 async def delete_curso(
     curso_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user)
 ):
     curso = await crud.get_curso_by_id(db, curso_id)
     if not curso:
         raise HTTPException(status_code=404, detail="Curso não encontrado.")
-    await db.delete(curso)
-    await db.commit()
+    await crud.delete_curso(db, curso)
     return
 
 @router.post("/arquivos-gerais", response_model=schemas.AdminArquivoPublic, status_code=status.HTTP_201_CREATED)
 async def upload_general_file(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_admin: models.Professor = Depends(auth.get_current_admin_user),
     file: UploadFile = File(...),
     descricao: Optional[str] = Form(None)
@@ -173,4 +265,4 @@ async def upload_general_file(
         uploader_id=current_admin.id
     )
 
-    return await crud.create_admin_arquivo(db, arquivo_in=arquivo_in)
\ No newline at end of file
+    return await crud.create_admin_arquivo(db, arquivo_in=arquivo_in, uploader=current_admin)
\ No newline at end of file
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm # For form data login
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import schemas, crud, auth, models
 from app.database import get_db
-from app.core.security import create_access_token
+from app.core.security import create_access_token, password_needs_rehash
 from app.core.config import settings
+from app.core.rate_limit import login_rate_limiter
 from datetime import timedelta
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -40,33 +42,57 @@ async def get_current_user(
             "user_type": user_type
 }
 
+# Ordem de prioridade das mensagens quando mais de um campo conflita
+STUDENT_CONFLICTS = [
+    ("estudante_email", "Email already registered by a student"),
+    ("professor_email", "Email already registered by a professor"),
+    ("matricula", "Matricula already registered"),
+]
+PROFESSOR_CONFLICTS = [
+    ("professor_email", "Email already registered by a professor"),
+    ("estudante_email", "Email already registered by a student"),
+    ("siape", "SIAPE already registered"),
+]
+
+async def _check_registration(db: AsyncSession, user_in, conflict_messages) -> None:
+    curso_id = getattr(user_in, "curso_id", None)
+    conflicts = await crud.get_registration_conflicts(
+        db,
+        email=user_in.email,
+        matricula=getattr(user_in, "matricula", None),
+        siape=getattr(user_in, "siape", None),
+        curso_id=curso_id or None,
+    )
+    for campo, detail in conflict_messages:
+        if campo in conflicts:
+            raise HTTPException(status_code=400, detail=detail)
+    if curso_id and "curso" not in conflicts:
+        raise HTTPException(status_code=404, detail=f"Curso with id {curso_id} not found.")
+
+async def _register(db: AsyncSession, user_in, conflict_messages, create):
+    """
+    Uma consulta de verificação e um INSERT. Se um cadastro concorrente vencer a
+    corrida, a violação de unicidade vira a mesma resposta 400 da verificação.
+    """
+    await _check_registration(db, user_in, conflict_messages)
+    try:
+        return await create()
+    except IntegrityError:
+        await db.rollback()
+        await _check_registration(db, user_in, conflict_messages)
+        raise HTTPException(status_code=400, detail="User already registered")
+
 @router.post("/register/student", response_model=schemas.EstudantePublic, status_code=status.HTTP_201_CREATED)
 async def register_student(
-    student_in: schemas.EstudanteCreate, db: AsyncSession = Depends(get_db)
+    student_in: schemas.EstudanteCreate, db: AsyncSession = Depends(get_db, scope="function")
 ):
-    db_student_email = await crud.get_estudante_by_email(db, email=student_in.email)
-    if db_student_email:
-        raise HTTPException(status_code=400, detail="Email already registered by a student")
-    
-    db_professor_email = await crud.get_professor_by_email(db, email=student_in.email)
-    if db_professor_email:
-        raise HTTPException(status_code=400, detail="Email already registered by a professor")
-
-    db_student_matricula = await crud.get_estudante_by_matricula(db, matricula=student_in.matricula)
-    if db_student_matricula:
-        raise HTTPException(status_code=400, detail="Matricula already registered")
-    
-    # Optionally check if curso_id exists if provided
-    if student_in.curso_id:
-        curso = await crud.get_curso_by_id(db, student_in.curso_id)
-        if not curso:
-            raise HTTPException(status_code=404, detail=f"Curso with id {student_in.curso_id} not found.")
-
-    return await crud.create_estudante(db=db, estudante=student_in)
+    return await _register(
+        db, student_in, STUDENT_CONFLICTS, lambda: crud.create_estudante(db=db, estudante=student_in)
+    )
 
 @router.post("/register/professor", response_model=schemas.ProfessorPublic, status_code=status.HTTP_201_CREATED)
 async def register_professor(
-    professor_in: schemas.ProfessorCreate, db: AsyncSession = Depends(get_db)
+    professor_in: schemas.ProfessorCreate, db: AsyncSession = Depends(get_db, scope="function")
 ):
     # Ensure only admins can create other professors with special roles (admin/coordenador)
     # For self-registration, role should default to PROFESSOR or be enforced.
@@ -75,25 +101,28 @@ async def register_professor(
     if professor_in.role != models.UserRole.PROFESSOR:
          raise HTTPException(status_code=403, detail="Cannot self-register with special roles. Contact an admin.")
 
-    db_professor_email = await crud.get_professor_by_email(db, email=professor_in.email)
-    if db_professor_email:
-        raise HTTPException(status_code=400, detail="Email already registered by a professor")
-
-    db_student_email = await crud.get_estudante_by_email(db, email=professor_in.email)
-    if db_student_email:
-        raise HTTPException(status_code=400, detail="Email already registered by a student")
-
-    db_professor_siape = await crud.get_professor_by_siape(db, siape=professor_in.siape)
-    if db_professor_siape:
-        raise HTTPException(status_code=400, detail="SIAPE already registered")
-    
-    return await crud.create_professor(db=db, professor=professor_in, role=models.UserRole.PROFESSOR)
+    return await _register(
+        db, professor_in, PROFESSOR_CONFLICTS,
+        lambda: crud.create_professor(db=db, professor=professor_in, role=models.UserRole.PROFESSOR),
+    )
 
 
 @router.post("/login", response_model=schemas.Token)
 async def login_for_access_token(
-    db: AsyncSession = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db, scope="function"), form_data: OAuth2PasswordRequestForm = Depends()
 ):
+    if settings.LOGIN_RATE_LIMIT_ENABLED:
+        client_ip = request.client.host if request.client else None
+        retry_after = await login_rate_limiter.check(client_ip, form_data.username)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Muitas tentativas de login. Tente novamente mais tarde.",
+                headers={"Retry-After": str(retry_after)},
+            )
+
     user = await auth.authenticate_user(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
@@ -102,12 +131,21 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user_type = "professor" if isinstance(user, models.Professor) else "estudante"
-    user_role = user.role if isinstance(user, models.Professor) else None
-    
+    # Hash gerado com custo/esquema antigo: refaz em segundo plano com os parâmetros atuais
+    if password_needs_rehash(user.hashed_password):
+        background_tasks.add_task(
+            auth.rehash_user_password, user.user_type, user.id, form_data.password, user.hashed_password
+        )
+
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email, "user_type": user_type, "role": user_role.value if user_role else None},
+        data={
+            "sub": user.email,
+            "uid": user.id,
+            "user_type": user.user_type,
+            "role": user.role.value if user.role else None,
+            "ver": user.token_version,
+        },
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
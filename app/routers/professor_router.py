@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, File, UploadFile, Form
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import schemas, crud, models, auth
-from app.database import get_db
+from app.core.cache import PROFESSORES_NAMESPACE, response_cache
+from app.database import get_db, get_read_db
+from app.fieldsets import parse_fieldset
+from app.pagination import NEXT_CURSOR_HEADER
+from app.progress import ESCOPO_CURSO, ESCOPO_ORIENTADOR, build_painel
 from typing import List, Optional
 from datetime import date
 import uuid
@@ -10,6 +15,7 @@ from pathlib import Path
 router = APIRouter(prefix="/professors", tags=["Professors"])
 UPLOAD_DIR = Path("uploads/tarefa_arquivos")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+PROFESSORES_ADAPTER = TypeAdapter(List[schemas.ProfessorPublic])
 
 
 @router.get("/me", response_model=schemas.ProfessorPublic)
@@ -23,31 +29,36 @@ async def read_professor_me(
 @router.put("/me", response_model=schemas.ProfessorPublic)
 async def update_current_user(
     user_update: schemas.ProfessorUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_user: models.Professor = Depends(auth.get_current_active_user)
 ):
-    for field, value in user_update.dict(exclude_unset=True).items():
-        setattr(current_user, field, value)
-    await db.commit()
-    await db.refresh(current_user)
-    return current_user
+    return await crud.update_professor(db, professor=current_user, professor_update=user_update)
 
 @router.get("/students", response_model=List[schemas.EstudantePublic])
 async def list_all_students_for_professor(
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db, scope="function"),
     current_professor: models.Professor = Depends(auth.get_current_active_user)
 ):
     if not isinstance(current_professor, models.Professor):
         raise HTTPException(status_code=403, detail="Acesso permitido apenas para professores.")
     
-    students = await crud.get_estudantes(db, skip=0, limit=1000) 
+    selection = parse_fieldset(schemas.EstudantePublic, models.Estudante, fields, None)
+    students, next_cursor = await crud.get_estudantes(db, limit=limit, cursor=cursor, selection=selection)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if selection:
+        return selection.response(students, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
     return students
 
 # NOVO: Endpoint para coordenador listar e filtrar alunos do seu curso
 @router.get("/coordenador/students", response_model=List[schemas.EstudantePublic])
 async def list_students_for_coordinator(
     turma: Optional[str] = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_user: models.Professor = Depends(auth.get_current_active_user)
 ):
     """
@@ -85,7 +96,7 @@ async def list_students_for_coordinator(
 @router.post("/me/convites-orientacao", response_model=schemas.ConviteOrientacaoPublic, status_code=status.HTTP_201_CREATED)
 async def convidar_aluno_para_orientacao(
     convite_in: schemas.ConviteOrientacaoCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_professor: models.Professor = Depends(auth.get_current_active_user)
 ):
     if not isinstance(current_professor, models.Professor):
@@ -103,26 +114,33 @@ async def convidar_aluno_para_orientacao(
     if existing_invite:
         raise HTTPException(status_code=400, detail="Este estudante já possui um convite de orientação pendente.")
     
-    novo_convite = await crud.create_convite_orientacao(db=db, convite=convite_in, professor_id=current_professor.id)
-    
-    convite_completo = await crud.get_convite_by_id(db, novo_convite.id)
-    return convite_completo
+    return await crud.create_convite_orientacao(
+        db=db, convite=convite_in, professor=current_professor, estudante=estudante
+    )
 
 @router.get("/me/convites-orientacao", response_model=List[schemas.ConviteOrientacaoPublic])
 async def get_meus_convites_enviados(
-    db: AsyncSession = Depends(get_db),
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db, scope="function"),
     current_professor: models.Professor = Depends(auth.get_current_active_user)
 ):
+    """
+    `fields`/`include` restringem a resposta (ex.: `fields=id,titulo_proposto,status&include=estudante`).
+    """
     if not isinstance(current_professor, models.Professor):
         raise HTTPException(status_code=403, detail="Acesso permitido apenas para professores.")
     
-    convites = await crud.get_convites_by_professor_id(db, professor_id=current_professor.id)
+    selection = parse_fieldset(schemas.ConviteOrientacaoPublic, models.OrientacaoConvite, fields, include)
+    convites = await crud.get_convites_by_professor_id(db, professor_id=current_professor.id, selection=selection)
+    if selection:
+        return selection.response(convites)
     return convites
 
 
 @router.get("/me/tccs", response_model=List[schemas.TCCPublic])
 async def get_my_oriented_tccs(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_professor: models.Professor = Depends(auth.get_current_active_user)
 ):
     if not isinstance(current_professor, models.Professor):
@@ -131,20 +149,64 @@ async def get_my_oriented_tccs(
     tccs = await crud.get_tccs_by_orientador_id(db, orientador_id=current_professor.id)
     return tccs
 
+@router.get("/me/painel", response_model=schemas.PainelProgresso)
+async def get_supervisor_dashboard(
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    current_professor: models.Professor = Depends(auth.get_current_active_user)
+):
+    """
+    Totais de tarefas e TCCs por status, e tarefas atrasadas, dos TCCs orientados.
+    """
+    if not isinstance(current_professor, models.Professor):
+        raise HTTPException(status_code=403, detail="Acesso permitido apenas para professores.")
+    rows = await crud.get_progresso_contadores(db, ESCOPO_ORIENTADOR, current_professor.id)
+    return build_painel(rows, date.today())
+
+@router.get("/coordenador/painel", response_model=schemas.PainelProgresso)
+async def get_coordinator_dashboard(
+    curso_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    current_user: models.Professor = Depends(auth.get_current_active_user)
+):
+    """
+    Totais de tarefas e TCCs por status, e tarefas atrasadas, do curso coordenado.
+    Admins informam o curso em `curso_id`.
+    """
+    if not isinstance(current_user, models.Professor) or current_user.role not in [models.UserRole.COORDENADOR, models.UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso permitido apenas para Coordenadores ou Admins."
+        )
+    if current_user.role == models.UserRole.COORDENADOR:
+        if not current_user.curso_coordenado:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Você não está associado como coordenador de nenhum curso."
+            )
+        curso_id = current_user.curso_coordenado.id_curso
+    elif curso_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Informe o 'curso_id'.")
+    rows = await crud.get_progresso_contadores(db, ESCOPO_CURSO, curso_id)
+    return build_painel(rows, date.today())
+
 @router.get("/departamento", response_model=List[schemas.ProfessorPublic])
 async def list_professores_mesmo_departamento(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_user: models.Professor = Depends(auth.get_current_active_user)
 ):
     if current_user.role not in [models.UserRole.COORDENADOR, models.UserRole.ADMIN]:
         raise HTTPException(status_code=403, detail="Acesso permitido apenas para coordenador ou admin.")
 
+    cache_key = response_cache.key(PROFESSORES_NAMESPACE, ("departamento", current_user.departamento))
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
     professores = await crud.get_professores_by_departamento(db, current_user.departamento)
-    return professores
+    return response_cache.store(cache_key, PROFESSORES_ADAPTER, professores)
 
 @router.get("/orientandos", response_model=List[schemas.EstudantePublic])
 async def get_orientandos(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_user: models.Professor = Depends(auth.get_current_active_user)
 ):
     if not isinstance(current_user, models.Professor):
@@ -155,7 +217,7 @@ async def get_orientandos(
 @router.post("/tccs/{tcc_id}/tarefas", response_model=schemas.TarefaPublic, status_code=status.HTTP_201_CREATED)
 async def create_task_for_tcc(
     tcc_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_professor: models.Professor = Depends(auth.get_current_active_user),
     titulo: str = Form(...),
     descricao: Optional[str] = Form(None),
@@ -172,8 +234,9 @@ async def create_task_for_tcc(
         raise HTTPException(status_code=403, detail="Você só pode criar tarefas para os TCCs que orienta.")
     
     tarefa_in = schemas.TarefaCreate(titulo=titulo, descricao=descricao, data_entrega=data_entrega)
-    nova_tarefa = await crud.create_tarefa(db=db, tarefa=tarefa_in, tcc_id=tcc_id)
-    
+    arquivos_in = []
+
+    # O arquivo é salvo antes: se falhar, a tarefa não chega a ser criada
     if file:
         unique_filename = f"{uuid.uuid4()}_{file.filename}"
         file_path = UPLOAD_DIR / unique_filename
@@ -182,20 +245,69 @@ async def create_task_for_tcc(
             with open(file_path, "wb") as buffer:
                 buffer.write(await file.read())
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Tarefa criada, mas não foi possível salvar o arquivo: {e}")
+            raise HTTPException(status_code=500, detail=f"Não foi possível salvar o arquivo da tarefa: {e}")
+
+        arquivos_in.append(schemas.ArquivoCreate(nome_arquivo=file.filename, caminho_arquivo=str(file_path)))
+
+    return await crud.create_tarefa(db=db, tarefa=tarefa_in, tcc_id=tcc_id, arquivos=arquivos_in)
+
+
+@router.post("/tccs/tarefas", response_model=List[schemas.TarefaPublic], status_code=status.HTTP_201_CREATED)
+async def create_task_for_many_tccs(
+    db: AsyncSession = Depends(get_db, scope="function"),
+    current_professor: models.Professor = Depends(auth.get_current_active_user),
+    titulo: str = Form(...),
+    descricao: Optional[str] = Form(None),
+    data_entrega: Optional[date] = Form(None),
+    tcc_ids: List[int] = Form([]),
+    todos: bool = Form(False),
+    file: Optional[UploadFile] = File(None)
+):
+    """
+    Cria a mesma tarefa em vários TCCs orientados pelo professor: os informados em
+    `tcc_ids` (campo repetido no formulário) ou, com `todos=true`, em todos eles.
+    O anexo opcional é salvo uma única vez e vinculado a cada tarefa criada.
+    """
+    if not isinstance(current_professor, models.Professor):
+        raise HTTPException(status_code=403, detail="Acesso permitido apenas para professores.")
+    if not todos and not tcc_ids:
+        raise HTTPException(status_code=400, detail="Informe os TCCs em 'tcc_ids' ou use 'todos=true'.")
+
+    tarefa_in = schemas.TarefaCreate(titulo=titulo, descricao=descricao, data_entrega=data_entrega)
+
+    # Verifica a orientação de todos os TCCs em uma única consulta
+    requested_ids = None if todos else sorted(set(tcc_ids))
+    owned_ids = await crud.get_owned_tcc_ids(db, current_professor.id, requested_ids)
+    if requested_ids is not None and len(owned_ids) != len(requested_ids):
+        not_owned = sorted(set(requested_ids) - set(owned_ids))
+        raise HTTPException(
+            status_code=403,
+            detail=f"Você só pode criar tarefas para os TCCs que orienta. TCCs inválidos: {not_owned}",
+        )
+    if not owned_ids:
+        raise HTTPException(status_code=400, detail="Você não orienta nenhum TCC.")
+
+    arquivo_in = None
+    if file:
+        unique_filename = f"{uuid.uuid4()}_{file.filename}"
+        file_path = UPLOAD_DIR / unique_filename
+
+        try:
+            with open(file_path, "wb") as buffer:
+                buffer.write(await file.read())
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Não foi possível salvar o arquivo da tarefa: {e}")
 
         arquivo_in = schemas.ArquivoCreate(nome_arquivo=file.filename, caminho_arquivo=str(file_path))
-        await crud.create_arquivo(db, arquivo=arquivo_in, tarefa_id=nova_tarefa.id)
 
-    tarefa_completa = await crud.get_tarefa_by_id(db, nova_tarefa.id)
-    return tarefa_completa
+    return await crud.create_tarefas_for_tccs(db, tarefa=tarefa_in, tcc_ids=owned_ids, arquivo=arquivo_in)
 
 
 @router.put("/tarefas/{tarefa_id}", response_model=schemas.TarefaPublic)
 async def update_task(
     tarefa_id: int,
     tarefa_update: schemas.TarefaUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_professor: models.Professor = Depends(auth.get_current_active_user)
 ):
     if not isinstance(current_professor, models.Professor):
@@ -212,7 +324,7 @@ async def update_task(
 @router.delete("/tarefas/{tarefa_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_task(
     tarefa_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_professor: models.Professor = Depends(auth.get_current_active_user)
 ):
     if not isinstance(current_professor, models.Professor):
@@ -231,7 +343,7 @@ async def delete_task(
 async def professor_upload_file_for_task(
     tarefa_id: int,
     file: UploadFile = File(...),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_professor: models.Professor = Depends(auth.get_current_active_user)
 ):
     if not isinstance(current_professor, models.Professor):
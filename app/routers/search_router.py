@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Literal, Optional
+
+from app import schemas, auth
+from app.search import TIPO_ESTUDANTE, TIPO_PROFESSOR, TIPO_TCC, search_index
+
+router = APIRouter(tags=["Busca"])
+
+# Estudantes só buscam professores (ex.: para escolher o orientador)
+TIPOS_POR_USUARIO = {
+    "estudante": {TIPO_PROFESSOR},
+    "professor": {TIPO_ESTUDANTE, TIPO_PROFESSOR, TIPO_TCC},
+}
+
+
+@router.get("/search", response_model=List[schemas.ResultadoBusca])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    tipos: Optional[List[Literal["estudante", "professor", "tcc"]]] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Busca por nome, matrícula, turma, departamento e título/descrição de TCC.
+    Cada termo também casa como prefixo, o que serve para autocomplete.
+    Os resultados vêm ordenados por relevância.
+    """
+    permitidos = TIPOS_POR_USUARIO[current_user.user_type]
+    if tipos:
+        if not set(tipos) <= permitidos:
+            raise HTTPException(status_code=403, detail="Você não tem permissão para buscar esses tipos.")
+        permitidos = set(tipos)
+    await search_index.ensure_fresh()
+    return search_index.search(q, permitidos, limit=limit)
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import schemas, crud, models, auth
-from app.database import get_db
-from typing import List
+from app.core.cache import PROFESSORES_NAMESPACE, response_cache
+from app.database import get_db, get_read_db, reads_from_primary_after_write
+from app.etag import make_etag, not_modified
+from app.fieldsets import parse_fieldset
+from app.pagination import NEXT_CURSOR_HEADER
+from typing import List, Optional
 import os
 import uuid
 from pathlib import Path
@@ -14,6 +19,7 @@ UPLOAD_DIR = Path("uploads/tcc_files")
 ALLOWED_FILE_TYPES = ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"]
 MAX_FILE_SIZE_MB = 20
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+PROFESSORES_ADAPTER = TypeAdapter(List[schemas.ProfessorPublic])
 
 @router.get("/me", response_model=schemas.EstudantePublic)
 async def read_student_me(
@@ -26,38 +32,61 @@ async def read_student_me(
 # NOVO: Endpoint para listar todos os professores para um aluno logado.
 @router.get("/professors", response_model=List[schemas.ProfessorPublic])
 async def list_all_professors_for_student(
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db, scope="function"),
     current_student: models.Estudante = Depends(auth.get_current_active_user)
 ):
     """
-    Lista todos os professores cadastrados no sistema.
+    Lista os professores cadastrados no sistema, ordenados por nome.
     Acesso permitido para qualquer estudante autenticado.
+    Paginado por cursor: a próxima página vem no header X-Next-Cursor.
     """
     if not isinstance(current_student, models.Estudante):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso permitido apenas para estudantes.")
     
-    professores = await crud.get_professores(db, skip=0, limit=1000) # Limite alto para buscar todos
-    return professores
+    cache_key = response_cache.key(PROFESSORES_NAMESPACE, ("todos", limit, cursor), bypass=reads_from_primary_after_write(db))
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    professores, next_cursor = await crud.get_professores(db, limit=limit, cursor=cursor)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return response_cache.store(cache_key, PROFESSORES_ADAPTER, professores, headers)
 
 @router.get("/me/convites-orientacao", response_model=List[schemas.ConviteOrientacaoPublic])
 async def get_meus_convites_recebidos(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db, scope="function"),
     current_student: models.Estudante = Depends(auth.get_current_active_user)
 ):
     """
     Lista todos os convites de orientação recebidos pelo estudante logado.
+    Responde 304 se o `If-None-Match` ainda corresponde aos convites.
+    `fields`/`include` restringem a resposta (ex.: `fields=id,titulo_proposto,status&include=professor`).
     """
     if not isinstance(current_student, models.Estudante):
         raise HTTPException(status_code=403, detail="Acesso permitido apenas para contas de estudante.")
     
-    convites = await crud.get_convites_by_estudante_id(db, estudante_id=current_student.id)
+    selection = parse_fieldset(schemas.ConviteOrientacaoPublic, models.OrientacaoConvite, fields, include)
+    versao = await crud.get_convites_version_by_estudante_id(db, estudante_id=current_student.id)
+    etag = make_etag(f"convites:estudante:{current_student.id}:{selection.scope if selection else ''}", versao)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    response.headers["ETag"] = etag
+    convites = await crud.get_convites_by_estudante_id(db, estudante_id=current_student.id, selection=selection)
+    if selection:
+        return selection.response(convites, headers={"ETag": etag})
     return convites
 
 @router.post("/me/convites-orientacao/{convite_id}/responder", response_model=schemas.ConviteRespostaPublic)
 async def responder_convite_orientacao(
     convite_id: int,
     resposta: schemas.ConviteOrientacaoUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_student: models.Estudante = Depends(auth.get_current_active_user)
 ):
     """
@@ -98,14 +127,13 @@ async def responder_convite_orientacao(
         )
         novo_tcc = await crud.create_tcc(db=db, tcc_in=tcc_in, orientador_id=convite.professor_id)
 
-    convite_completo = await crud.get_convite_by_id(db, convite_id)
-
-    return schemas.ConviteRespostaPublic(convite=convite_completo, tcc=novo_tcc)
+    # O convite já foi carregado com professor e estudante; convite e TCC são gravados juntos no commit
+    return schemas.ConviteRespostaPublic(convite=convite, tcc=novo_tcc)
 
 
 @router.get("/me/tccs", response_model=List[schemas.TCCPublic])
 async def get_my_tccs(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_student: models.Estudante = Depends(auth.get_current_active_user)
 ):
     if not isinstance(current_student, models.Estudante):
@@ -119,7 +147,7 @@ async def upload_tcc_file(
     tcc_id: int,
     file: UploadFile = File(...),
     current_user: models.Estudante = Depends(auth.get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     if not isinstance(current_user, models.Estudante):
         raise HTTPException(status_code=403, detail="Apenas estudantes podem fazer upload de arquivos de TCC.")
@@ -174,7 +202,7 @@ async def upload_tcc_file(
 async def get_tcc_files(
     tcc_id: int,
     current_user: models.Estudante = Depends(auth.get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
     if not isinstance(current_user, models.Estudante):
         raise HTTPException(status_code=403, detail="Não é uma conta de estudante.")
@@ -193,7 +221,7 @@ async def get_tcc_files(
 async def upload_file_for_task(
     tarefa_id: int,
     file: UploadFile = File(...),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_student: models.Estudante = Depends(auth.get_current_active_user)
 ):
     if not isinstance(current_student, models.Estudante):
@@ -228,13 +256,24 @@ async def upload_file_for_task(
 # NOVO: Endpoint para estudante listar os arquivos gerais enviados pelo admin
 @router.get("/arquivos-gerais", response_model=List[schemas.AdminArquivoPublic])
 async def get_general_files(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db, scope="function"),
     current_student: models.Estudante = Depends(auth.get_current_active_user),
     skip: int = 0,
-    limit: int = 100
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
 ):
     if not isinstance(current_student, models.Estudante):
         raise HTTPException(status_code=403, detail="Acesso permitido apenas para estudantes.")
     
-    arquivos = await crud.get_admin_arquivos(db, skip=skip, limit=limit)
+    versao = await crud.get_admin_arquivos_version(db)
+    etag = make_etag(f"arquivos-gerais:{skip}:{limit}:{cursor}", versao)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    response.headers["ETag"] = etag
+    arquivos, next_cursor = await crud.get_admin_arquivos(db, skip=skip, limit=limit, cursor=cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return arquivos
\ No newline at end of file
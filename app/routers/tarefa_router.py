@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 import uuid
 from pathlib import Path
 
 from app import schemas, crud, models, auth
-from app.database import get_db
+from app.database import get_db, get_read_db
+from app.etag import make_etag, not_modified
+from app.fieldsets import parse_fieldset
 
 router = APIRouter(tags=["Tarefas"])
 
@@ -16,28 +18,79 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 @router.get("/tccs/{tcc_id}/tarefas", response_model=List[schemas.TarefaPublic])
 async def get_tasks_for_tcc(
     tcc_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: models.Professor | models.Estudante = Depends(auth.get_current_active_user)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
-    tcc = await crud.get_tcc_by_id(db, tcc_id)
-    if not tcc:
+    """
+    Responde 304 se o `If-None-Match` do cliente ainda corresponde às tarefas do TCC.
+    `fields`/`include` restringem a resposta (ex.: `fields=id,titulo,status` sem os arquivos).
+    """
+    selection = parse_fieldset(schemas.TarefaPublic, models.Tarefa, fields, include)
+    versao = await crud.get_tcc_tarefas_version(db, tcc_id)
+    if not versao:
         raise HTTPException(status_code=404, detail="TCC não encontrado.")
     
-    is_orientador = isinstance(current_user, models.Professor) and tcc.orientador_id == current_user.id
-    is_aluno = isinstance(current_user, models.Estudante) and tcc.estudante_id == current_user.id
+    is_orientador = current_user.is_professor and versao.orientador_id == current_user.id
+    is_aluno = current_user.is_estudante and versao.estudante_id == current_user.id
     
     if not (is_orientador or is_aluno):
         raise HTTPException(status_code=403, detail="Você não tem permissão para visualizar as tarefas deste TCC.")
-        
-    return await crud.get_tarefas_by_tcc_id(db, tcc_id=tcc_id)
+
+    etag = make_etag(f"tarefas:{tcc_id}:{selection.scope if selection else ''}", versao[2:])
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    response.headers["ETag"] = etag
+    tarefas = await crud.get_tarefas_by_tcc_id(db, tcc_id=tcc_id, selection=selection)
+    if selection:
+        return selection.response(tarefas, headers={"ETag": etag})
+    return tarefas
+
+@router.patch("/tarefas/status", response_model=List[schemas.TarefaPublic])
+async def update_tasks_status(
+    lote: schemas.TarefaStatusLoteUpdate,
+    db: AsyncSession = Depends(get_db, scope="function"),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Altera o status de várias tarefas de uma vez (ex.: mover uma coluna do quadro).
+
+    - **Permissão**: o usuário deve ser o orientador ou o estudante do TCC de **todas** as tarefas;
+      caso contrário nada é alterado.
+    - **Ação**: aplica todas as transições em um único UPDATE e retorna as tarefas atualizadas.
+    """
+    status_by_id = {item.tarefa_id: item.status for item in lote.itens}
+    if len(status_by_id) != len(lote.itens):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cada tarefa pode aparecer apenas uma vez.")
+
+    # Permissão de todas as tarefas em uma única consulta (join com o TCC)
+    access = await crud.get_tarefas_access(db, list(status_by_id))
+    missing = sorted(set(status_by_id) - {row.id for row in access})
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Tarefas não encontradas: {missing}")
+    if current_user.is_professor:
+        forbidden = sorted(row.id for row in access if row.orientador_id != current_user.id)
+    else:
+        forbidden = sorted(row.id for row in access if row.estudante_id != current_user.id)
+    if forbidden:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Você não tem permissão para alterar as tarefas: {forbidden}"
+        )
+
+    return await crud.update_tarefas_status(db, status_by_id)
 
 # NOVO: Endpoint unificado para Professor ou Aluno alterarem o status de uma tarefa.
 @router.patch("/tarefas/{tarefa_id}/status", response_model=schemas.TarefaPublic)
 async def update_task_status(
     tarefa_id: int,
     status_update: schemas.TarefaUpdate, # Reutiliza o schema, esperando apenas o campo 'status'.
-    db: AsyncSession = Depends(get_db),
-    current_user: models.Professor | models.Estudante = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(get_db, scope="function"),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
     """
     Atualiza o status de uma tarefa específica.
@@ -51,8 +104,8 @@ async def update_task_status(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tarefa não encontrada.")
 
     # Verifica se o usuário logado é o orientador ou o aluno do TCC ao qual a tarefa pertence.
-    is_orientador = isinstance(current_user, models.Professor) and tarefa.tcc.orientador_id == current_user.id
-    is_aluno = isinstance(current_user, models.Estudante) and tarefa.tcc.estudante_id == current_user.id
+    is_orientador = current_user.is_professor and tarefa.tcc.orientador_id == current_user.id
+    is_aluno = current_user.is_estudante and tarefa.tcc.estudante_id == current_user.id
 
     if not (is_orientador or is_aluno):
         raise HTTPException(
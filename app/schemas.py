@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Dict, Literal, Optional, List
 from datetime import datetime, date
 from app.models import UserRole, StatusEstudante, StatusTCC, StatusTarefa, StatusConvite, StatusProfessor
 
@@ -22,6 +22,13 @@ class UserBase(BaseModel):
 class UserCreateBase(UserBase):
     password: str = Field(..., min_length=8)
 
+# Base das respostas: o email vem do banco e já foi validado no cadastro. Revalidá-lo
+# com email-validator a cada linha respondia por ~90% do custo de serializar as listas.
+class UserPublicBase(BaseModel):
+    email: str = Field(..., json_schema_extra={"format": "email"})
+    nome: str = Field(..., min_length=3, max_length=100)
+    telefone: Optional[str] = Field(None, max_length=20)
+
 # --- Schemas de Estudante ---
 class EstudanteCreate(UserCreateBase):
     matricula: str = Field(..., min_length=5, max_length=20)
@@ -35,7 +42,7 @@ class EstudanteUpdate(BaseModel):
     status: Optional[StatusEstudante] = None
     telefone: Optional[str] = Field(None, max_length=20)
 
-class EstudantePublic(UserBase):
+class EstudantePublic(UserPublicBase):
     id: int
     matricula: str
     status: StatusEstudante
@@ -57,10 +64,10 @@ class ProfessorUpdate(BaseModel):
     siape: Optional[str] = None
     departamento: Optional[str] = None
     titulacao: Optional[str] = None
-    role: Optional[UserRole] = None
+    # Sem `role`: o papel só muda pelas rotas de admin, que também revogam os tokens
     telefone: Optional[str] = Field(None, max_length=20)
 
-class ProfessorPublic(UserBase):
+class ProfessorPublic(UserPublicBase):
     id: int
     siape: str
     departamento: Optional[str] = None
@@ -160,6 +167,13 @@ class TarefaUpdate(BaseModel):
     data_entrega: Optional[date] = None
     status: Optional[StatusTarefa] = None
 
+class TarefaStatusItem(BaseModel):
+    tarefa_id: int
+    status: StatusTarefa
+
+class TarefaStatusLoteUpdate(BaseModel):
+    itens: List[TarefaStatusItem] = Field(..., min_length=1, max_length=500)
+
 class TarefaPublic(TarefaBase):
     id: int
     tcc_id: int
@@ -209,4 +223,30 @@ class AdminArquivoPublic(AdminArquivoBase):
     uploader: ProfessorPublic
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# --- Schemas de importação em lote ---
+class ImportacaoErroLinha(BaseModel):
+    linha: int
+    email: Optional[str] = None
+    erros: List[str]
+
+class ImportacaoResultado(BaseModel):
+    total: int
+    criados: int
+    erros: List[ImportacaoErroLinha] = []
+
+# --- Schemas de painéis de progresso ---
+class PainelProgresso(BaseModel):
+    tarefas_por_status: Dict[StatusTarefa, int]
+    tccs_por_status: Dict[StatusTCC, int]
+    tarefas_atrasadas: int
+
+# --- Schemas de busca ---
+class ResultadoBusca(BaseModel):
+    tipo: Literal["estudante", "professor", "tcc"]
+    id: int
+    titulo: str
+    detalhe: Optional[str] = None
+    score: float
@@ -0,0 +1,290 @@
+"""
+Busca textual sobre estudantes, professores e TCCs com um índice invertido em memória.
+
+Cada worker mantém o próprio índice:
+- é construído na primeira busca, lendo só as colunas indexadas (réplica, se houver);
+- as escritas deste worker o atualizam logo após o commit (`run_after_commit`);
+- escritas de outros workers aparecem no máximo após SEARCH_INDEX_REFRESH_SECONDS,
+  quando o índice é reconstruído por inteiro.
+
+A construção (tokenização e listas invertidas) roda em uma thread, fora do event
+loop. Depois da primeira construção, as reconstruções acontecem em segundo plano:
+as buscas continuam respondendo com o índice atual até o novo ficar pronto.
+
+Todos os termos da consulta precisam aparecer no documento; cada termo também casa
+como prefixo (autocomplete), com peso menor que o casamento exato. O score soma o
+peso do campo em que o termo aparece (nome/matrícula/título valem mais).
+"""
+import asyncio
+import bisect
+import heapq
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from app import models, schemas
+from app.core.config import settings
+from app.database import ReadSessionLocal
+
+TIPO_ESTUDANTE = "estudante"
+TIPO_PROFESSOR = "professor"
+TIPO_TCC = "tcc"
+
+# Peso de cada campo no score
+FIELD_WEIGHTS = {
+    TIPO_ESTUDANTE: {"nome": 3.0, "matricula": 3.0, "turma": 1.0},
+    TIPO_PROFESSOR: {"nome": 3.0, "departamento": 1.0},
+    TIPO_TCC: {"titulo": 2.0, "descricao": 1.0},
+}
+PREFIX_FACTOR = 0.5
+# Termos mais curtos que isso só casam exatamente ("a" casaria com quase tudo)
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSION = 500
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+DocKey = Tuple[str, int]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    ascii_text = "".join(char for char in normalized if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(ascii_text)
+
+
+@dataclass(frozen=True, slots=True)
+class _Document:
+    tipo: str
+    id: int
+    titulo: str
+    detalhe: Optional[str]
+    weights: Dict[str, float]
+
+
+def _document(tipo: str, doc_id: int, fields: Dict[str, Optional[str]], titulo: str, detalhe: Optional[str]) -> _Document:
+    weights: Dict[str, float] = {}
+    for field, value in fields.items():
+        weight = FIELD_WEIGHTS[tipo][field]
+        for term in tokenize(value):
+            weights[term] = max(weights.get(term, 0.0), weight)
+    return _Document(tipo, doc_id, titulo, detalhe, weights)
+
+
+def estudante_document(id: int, nome: str, matricula: str, turma: Optional[str]) -> _Document:
+    detalhe = f"Matrícula {matricula}" + (f" · Turma {turma}" if turma else "")
+    return _document(TIPO_ESTUDANTE, id, {"nome": nome, "matricula": matricula, "turma": turma}, nome, detalhe)
+
+
+def professor_document(id: int, nome: str, departamento: Optional[str]) -> _Document:
+    return _document(TIPO_PROFESSOR, id, {"nome": nome, "departamento": departamento}, nome, departamento)
+
+
+def tcc_document(id: int, titulo: str, descricao: Optional[str]) -> _Document:
+    return _document(TIPO_TCC, id, {"titulo": titulo, "descricao": descricao}, titulo, None)
+
+
+class SearchIndex:
+    def __init__(self):
+        self._documents: Dict[DocKey, _Document] = {}
+        self._postings: Dict[str, Dict[DocKey, float]] = {}
+        self._terms: List[str] = []  # ordenados, para busca por prefixo
+        self.built_at: Optional[float] = None
+        self.rebuilds = 0
+        self.searches = 0
+        self._stale = True
+        self._build_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Escritas confirmadas durante uma reconstrução, reaplicadas no índice novo
+        self._pending: Optional[List[Tuple[str, int, Optional[_Document]]]] = None
+        self.last_error: Optional[str] = None
+
+    # --- Manutenção ---
+    def _add(self, document: _Document) -> None:
+        key = (document.tipo, document.id)
+        self._documents[key] = document
+        for term, weight in document.weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._terms, term)
+            postings[key] = weight
+
+    def _remove(self, tipo: str, doc_id: int) -> None:
+        key = (tipo, doc_id)
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        for term in document.weights:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+                    index = bisect.bisect_left(self._terms, term)
+                    if index < len(self._terms) and self._terms[index] == term:
+                        del self._terms[index]
+
+    def upsert(self, document: _Document) -> None:
+        if self._pending is not None:
+            self._pending.append((document.tipo, document.id, document))
+        # Antes da primeira construção não há o que atualizar
+        if self.built_at is None:
+            return
+        self._remove(document.tipo, document.id)
+        self._add(document)
+
+    def remove(self, tipo: str, doc_id: int) -> None:
+        if self._pending is not None:
+            self._pending.append((tipo, doc_id, None))
+        self._remove(tipo, doc_id)
+
+    def mark_stale(self) -> None:
+        """
+        Força a reconstrução na próxima busca (ex.: após importação em lote).
+        """
+        self._stale = True
+
+    def _needs_rebuild(self) -> bool:
+        return (
+            self._stale
+            or self.built_at is None
+            or time.monotonic() - self.built_at >= settings.SEARCH_INDEX_REFRESH_SECONDS
+        )
+
+    async def ensure_fresh(self) -> None:
+        if not self._needs_rebuild():
+            return
+        if self.built_at is not None:
+            # Já existe um índice: reconstrói em segundo plano e segue com o atual
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh())
+            return
+        async with self._build_lock:
+            if self.built_at is None:
+                await self.rebuild()
+
+    async def _refresh(self) -> None:
+        try:
+            async with self._build_lock:
+                if self._needs_rebuild():
+                    await self.rebuild()
+        except Exception as exc:
+            # Continua com o índice atual; a próxima busca tenta de novo
+            self.last_error = repr(exc)
+
+    async def rebuild(self) -> None:
+        # Limpo antes da leitura: um mark_stale durante a reconstrução pede outra
+        self._stale = False
+        self._pending = []
+        try:
+            rows = await _load_rows()
+            documents, postings, terms = await asyncio.to_thread(_build, rows)
+            # Troca o conteúdo de uma vez; buscas concorrentes veem o índice antigo ou o novo
+            self._documents, self._postings, self._terms = documents, postings, terms
+            for tipo, doc_id, document in self._pending:
+                self._remove(tipo, doc_id)
+                if document is not None:
+                    self._add(document)
+        except BaseException:
+            self._stale = True
+            raise
+        finally:
+            self._pending = None
+        self.built_at = time.monotonic()
+        self.rebuilds += 1
+        self.last_error = None
+
+    # --- Consulta ---
+    def _matches(self, token: str) -> Dict[DocKey, float]:
+        """
+        Documentos que contêm `token` exato ou como prefixo, com o melhor peso de cada um.
+        """
+        scores: Dict[DocKey, float] = dict(self._postings.get(token, {}))
+        if len(token) < MIN_PREFIX_LENGTH:
+            return scores
+        start = bisect.bisect_left(self._terms, token)
+        for term in self._terms[start:start + MAX_PREFIX_EXPANSION]:
+            if not term.startswith(token):
+                break
+            if term == token:
+                continue
+            for key, weight in self._postings[term].items():
+                score = weight * PREFIX_FACTOR
+                if score > scores.get(key, 0.0):
+                    scores[key] = score
+        return scores
+
+    def search(self, query: str, tipos: Iterable[str], limit: int = 20) -> List[schemas.ResultadoBusca]:
+        self.searches += 1
+        tokens = list(dict.fromkeys(tokenize(query)))
+        allowed: Set[str] = set(tipos)
+        if not tokens or not allowed:
+            return []
+        # Começa pelo termo mais seletivo para reduzir as interseções
+        per_token = sorted((self._matches(token) for token in tokens), key=len)
+        totals = {key: score for key, score in per_token[0].items() if key[0] in allowed}
+        for matches in per_token[1:]:
+            totals = {key: score + matches[key] for key, score in totals.items() if key in matches}
+            if not totals:
+                return []
+        ranked = heapq.nsmallest(
+            limit, totals.items(), key=lambda item: (-item[1], self._documents[item[0]].titulo.lower())
+        )
+        results = []
+        for key, score in ranked:
+            document = self._documents[key]
+            results.append(schemas.ResultadoBusca(
+                tipo=document.tipo, id=document.id, titulo=document.titulo, detalhe=document.detalhe, score=round(score, 3)
+            ))
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._documents),
+            "terms": len(self._terms),
+            "age_seconds": round(time.monotonic() - self.built_at, 1) if self.built_at is not None else None,
+            "refresh_seconds": settings.SEARCH_INDEX_REFRESH_SECONDS,
+            "rebuilds": self.rebuilds,
+            "rebuilding": self._build_lock.locked(),
+            "searches": self.searches,
+            "last_error": self.last_error,
+        }
+
+
+async def _load_rows() -> Tuple[list, list, list]:
+    async with ReadSessionLocal() as db:
+        estudantes = await db.execute(
+            select(models.Estudante.id, models.Estudante.nome, models.Estudante.matricula, models.Estudante.turma)
+        )
+        professores = await db.execute(
+            select(models.Professor.id, models.Professor.nome, models.Professor.departamento)
+        )
+        tccs = await db.execute(select(models.TCC.id, models.TCC.titulo, models.TCC.descricao))
+        return estudantes.all(), professores.all(), tccs.all()
+
+
+def _build(rows: Tuple[list, list, list]) -> Tuple[Dict[DocKey, _Document], Dict[str, Dict[DocKey, float]], List[str]]:
+    """
+    Monta documentos, listas invertidas e termos ordenados. Roda fora do event loop
+    e só cria estruturas novas, sem tocar no índice em uso.
+    """
+    estudantes, professores, tccs = rows
+    documents: Dict[DocKey, _Document] = {}
+    postings: Dict[str, Dict[DocKey, float]] = {}
+    for builder, group in ((estudante_document, estudantes), (professor_document, professores), (tcc_document, tccs)):
+        for row in group:
+            document = builder(*row)
+            key = (document.tipo, document.id)
+            documents[key] = document
+            for term, weight in document.weights.items():
+                postings.setdefault(term, {})[key] = weight
+    return documents, postings, sorted(postings)
+
+
+search_index = SearchIndex()
@@ -0,0 +1,128 @@
+"""
+Configuração comum dos testes: a aplicação roda sobre um banco SQLite temporário,
+criado pelo próprio startup (create_all + migrações + seed do admin).
+"""
+import itertools
+import os
+import tempfile
+
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix="apiprint2-tests-")
+TEST_DATABASE_PATH = os.path.join(TEST_DIR, "test.db")
+
+# As settings são lidas na importação de `app`, então o ambiente vem antes
+os.environ.update(
+    DATABASE_URL=f"sqlite+aiosqlite:///{TEST_DATABASE_PATH}",
+    DATABASE_REPLICA_URLS="",
+    SECRET_KEY="test-secret-key",
+    INITIAL_ADMIN_NOME="Admin",
+    INITIAL_ADMIN_EMAIL="admin@test.com",
+    INITIAL_ADMIN_SENHA="adminpass",
+    INITIAL_ADMIN_SIAPE="100000",
+    INITIAL_ADMIN_DEPARTAMENTO="DC",
+    INITIAL_ADMIN_TITULACAO="Dr",
+    LOGIN_RATE_LIMIT_ENABLED="false",
+    # Hash rápido: o custo do bcrypt não é o que está sendo testado
+    BCRYPT_ROUNDS="4",
+)
+# Os uploads usam caminhos relativos ao diretório atual; o router de estudantes
+# não cria o próprio diretório
+os.chdir(TEST_DIR)
+os.makedirs("uploads/tcc_files", exist_ok=True)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+_sequence = itertools.count(1)
+
+
+def login(client: TestClient, email: str, password: str) -> dict:
+    response = client.post("/auth/login", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client) -> dict:
+    return login(client, "admin@test.com", "adminpass")
+
+
+@pytest.fixture(scope="session")
+def make_curso(client, admin_headers):
+    def _make_curso() -> int:
+        response = client.post(
+            "/admin/cursos", json={"nome_curso": f"Curso {next(_sequence)}"}, headers=admin_headers
+        )
+        assert response.status_code == 201, response.text
+        return response.json()["id_curso"]
+
+    return _make_curso
+
+
+@pytest.fixture(scope="session")
+def make_professor(client):
+    def _make_professor(**extra) -> tuple:
+        n = next(_sequence)
+        payload = {
+            "email": f"prof{n}@test.com", "nome": f"Professor {n}", "password": "profpass1",
+            "siape": f"{200000 + n}", "departamento": "DC", **extra,
+        }
+        response = client.post("/auth/register/professor", json=payload)
+        assert response.status_code == 201, response.text
+        return response.json()["id"], login(client, payload["email"], payload["password"])
+
+    return _make_professor
+
+
+@pytest.fixture(scope="session")
+def make_estudante(client):
+    def _make_estudante(curso_id=None, turma="A", **extra) -> tuple:
+        n = next(_sequence)
+        payload = {
+            "email": f"aluno{n}@test.com", "nome": f"Aluno {n}", "password": "alunopass1",
+            "matricula": f"{300000 + n}", "curso_id": curso_id, "turma": turma, **extra,
+        }
+        response = client.post("/auth/register/student", json=payload)
+        assert response.status_code == 201, response.text
+        return response.json()["id"], login(client, payload["email"], payload["password"])
+
+    return _make_estudante
+
+
+@pytest.fixture(scope="session")
+def make_tcc(client, make_professor, make_estudante):
+    """
+    Professor, estudante e o TCC criado pelo aceite do convite de orientação.
+    """
+    def _make_tcc(professor=None, curso_id=None) -> dict:
+        professor_id, professor_headers = professor or make_professor()
+        estudante_id, estudante_headers = make_estudante(curso_id=curso_id)
+        response = client.post(
+            "/professors/me/convites-orientacao",
+            json={"titulo_proposto": "Título proposto", "estudante_id": estudante_id},
+            headers=professor_headers,
+        )
+        assert response.status_code == 201, response.text
+        response = client.post(
+            f"/students/me/convites-orientacao/{response.json()['id']}/responder",
+            json={"status": "aceito"},
+            headers=estudante_headers,
+        )
+        assert response.status_code == 200, response.text
+        return {
+            "id": response.json()["tcc"]["id"],
+            "professor_id": professor_id,
+            "professor": professor_headers,
+            "estudante_id": estudante_id,
+            "estudante": estudante_headers,
+        }
+
+    return _make_tcc
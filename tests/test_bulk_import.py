@@ -0,0 +1,38 @@
+"""
+Importação em lote: o arquivo é lido em lotes fora do event loop e os erros
+voltam com o número da linha.
+"""
+from app import bulk_import
+
+
+def test_import_reports_errors_across_batches(client, admin_headers, monkeypatch):
+    # Lotes pequenos para que o arquivo atravesse vários
+    monkeypatch.setattr(bulk_import, "BATCH_SIZE", 2)
+    linhas = ["email,nome,password,matricula,turma"]
+    for n in range(5):
+        linhas.append(f"lote{n}@test.com,Aluno Lote {n},alunopass1,{400000 + n},A")
+    linhas.append("lote0@test.com,Aluno Repetido,alunopass1,400099,A")
+    linhas.append("invalido,Aluno Inválido,alunopass1,400098,A")
+    conteudo = "\n".join(linhas).encode()
+
+    response = client.post(
+        "/admin/users/students/import",
+        files={"file": ("alunos.csv", conteudo, "text/csv")},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200, response.text
+    resultado = response.json()
+    assert (resultado["total"], resultado["criados"]) == (7, 5)
+    assert [(erro["linha"], erro["email"]) for erro in resultado["erros"]] == [
+        (7, "lote0@test.com"),
+        (8, "invalido"),
+    ]
+
+
+def test_import_rejects_non_utf8_file(client, admin_headers):
+    response = client.post(
+        "/admin/users/students/import",
+        files={"file": ("alunos.csv", "email,nome\nã@test.com,João".encode("latin-1"), "text/csv")},
+        headers=admin_headers,
+    )
+    assert response.status_code == 400
@@ -0,0 +1,52 @@
+"""
+ETags das listas consultadas em polling: alterações nos objetos aninhados também
+precisam mudar a versão, senão o 304 devolve dados velhos.
+"""
+
+
+def _etag(client, url: str, headers: dict) -> str:
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    assert client.get(url, headers={**headers, "If-None-Match": response.headers["ETag"]}).status_code == 304
+    return response.headers["ETag"]
+
+
+def test_convites_etag_follows_embedded_professor(client, make_professor, make_estudante):
+    _, professor_headers = make_professor()
+    estudante_id, estudante_headers = make_estudante()
+    response = client.post(
+        "/professors/me/convites-orientacao",
+        json={"titulo_proposto": "Título proposto", "estudante_id": estudante_id},
+        headers=professor_headers,
+    )
+    assert response.status_code == 201, response.text
+    url = "/students/me/convites-orientacao"
+    etag = _etag(client, url, estudante_headers)
+
+    response = client.put("/professors/me", json={"nome": "Professor Atualizado"}, headers=professor_headers)
+    assert response.status_code == 200, response.text
+
+    response = client.get(url, headers={**estudante_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["professor"]["nome"] == "Professor Atualizado"
+
+
+def test_arquivos_gerais_etag_follows_uploader(client, admin_headers, make_estudante):
+    response = client.post(
+        "/admin/arquivos-gerais",
+        files={"file": ("edital.pdf", b"%PDF-1.4", "application/pdf")},
+        headers=admin_headers,
+    )
+    assert response.status_code == 201, response.text
+    _, estudante_headers = make_estudante()
+    url = "/students/arquivos-gerais"
+    etag = _etag(client, url, estudante_headers)
+
+    response = client.put("/professors/me", json={"telefone": "11 99999-0000"}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    response = client.get(url, headers={**estudante_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert {arquivo["uploader"]["telefone"] for arquivo in response.json()} == {"11 99999-0000"}
@@ -0,0 +1,22 @@
+"""
+Contadores do pool de hashing exibidos em /admin/metrics.
+"""
+import asyncio
+
+import pytest
+
+from app.core.security import PasswordHasher
+
+
+def test_failures_are_not_counted_as_completed():
+    hasher = PasswordHasher(pool_size=1, max_queue=1)
+
+    async def run():
+        hashed = await hasher.hash("senha-valida")
+        assert await hasher.verify("senha-valida", hashed)
+        with pytest.raises(ValueError):
+            await hasher.verify("senha-valida", "não é um hash")
+
+    asyncio.run(run())
+    stats = hasher.stats()
+    assert (stats["completed"], stats["failed"], stats["in_flight"]) == (2, 1, 0)
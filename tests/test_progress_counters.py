@@ -0,0 +1,53 @@
+"""
+Os contadores mantidos incrementalmente batem com o recálculo completo (`rebuild_counters`).
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, select
+
+from app import database, models
+from app.progress import rebuild_counters
+
+
+def _contadores_e_recalculo() -> tuple:
+    engine = create_engine(f"sqlite:///{database.engine.url.database}")
+    table = models.ProgressoContador.__table__
+    consulta = select(table.c.escopo_tipo, table.c.escopo_id, table.c.metrica, table.c.valor).where(table.c.valor != 0)
+    try:
+        with engine.connect() as conn:
+            mantidos = sorted(conn.execute(consulta).all())
+            rebuild_counters(conn)
+            recalculados = sorted(conn.execute(consulta).all())
+            # O recálculo é só para comparação
+            conn.rollback()
+    finally:
+        engine.dispose()
+    return mantidos, recalculados
+
+
+def test_counters_follow_transitions_and_deletes(client, admin_headers, make_curso, make_professor, make_tcc):
+    curso_id = make_curso()
+    professor = make_professor()
+    tccs = [make_tcc(professor=professor, curso_id=curso_id) for _ in range(2)]
+    atrasada = (date.today() - timedelta(days=2)).isoformat()
+    response = client.post(
+        "/professors/tccs/tarefas", data={"titulo": "Entrega parcial", "todos": "true", "data_entrega": atrasada},
+        headers=professor[1],
+    )
+    assert response.status_code == 201, response.text
+    primeira, segunda = (tarefa["id"] for tarefa in response.json())
+
+    assert client.patch(f"/tarefas/{primeira}/status", json={"status": "fazendo"}, headers=tccs[0]["estudante"]).status_code == 200
+    response = client.patch(
+        "/tarefas/status", json={"itens": [{"tarefa_id": primeira, "status": "concluida"}]}, headers=professor[1]
+    )
+    assert response.status_code == 200, response.text
+    assert client.delete(f"/professors/tarefas/{segunda}", headers=professor[1]).status_code == 204
+    mantidos, recalculados = _contadores_e_recalculo()
+    assert mantidos == recalculados
+
+    # Sem o curso, os estudantes deixam o escopo dele
+    assert client.delete(f"/admin/cursos/{curso_id}", headers=admin_headers).status_code == 204
+    mantidos, recalculados = _contadores_e_recalculo()
+    assert mantidos == recalculados
+    assert not any((escopo_tipo, escopo_id) == ("curso", curso_id) for escopo_tipo, escopo_id, _, _ in mantidos)
@@ -0,0 +1,140 @@
+"""
+Orçamento de consultas SQL dos endpoints mais usados.
+
+Cada requisição roda dentro de `query_budget(n)`, que falha listando as consultas
+executadas quando o endpoint passa de `n`. As listas são medidas com várias linhas,
+então um N+1 estoura o orçamento. Os números incluem a autenticação quando o
+estado do token ainda não está em cache.
+"""
+import pytest
+
+from app.core.query_stats import query_budget
+
+
+@pytest.fixture(scope="module")
+def cenario(make_curso, make_professor, make_tcc, client):
+    """
+    Um professor orientando três TCCs de um mesmo curso, cada um com duas tarefas.
+    """
+    curso_id = make_curso()
+    professor = make_professor()
+    tccs = [make_tcc(professor=professor, curso_id=curso_id) for _ in range(3)]
+    for tcc in tccs:
+        for titulo in ("Primeira tarefa", "Segunda tarefa"):
+            response = client.post(
+                f"/professors/tccs/{tcc['id']}/tarefas", data={"titulo": titulo}, files={"file": ("a.txt", b"a")},
+                headers=professor[1],
+            )
+            assert response.status_code == 201, response.text
+    return {"curso_id": curso_id, "professor": professor[1], "tccs": tccs}
+
+
+def _tarefas(client, tcc) -> list:
+    return [tarefa["id"] for tarefa in client.get(f"/tccs/{tcc['id']}/tarefas", headers=tcc["estudante"]).json()]
+
+
+# --- Escritas ---
+def test_register_student(client, cenario):
+    payload = {
+        "email": "budget.aluno@test.com", "nome": "Aluno Orçamento", "password": "alunopass1",
+        "matricula": "BUDGET01", "curso_id": cenario["curso_id"],
+    }
+    # Checagem de conflitos (uma consulta) e INSERT
+    with query_budget(2):
+        response = client.post("/auth/register/student", json=payload)
+    assert response.status_code == 201, response.text
+
+
+def test_register_professor(client):
+    payload = {"email": "budget.prof@test.com", "nome": "Professor Orçamento", "password": "profpass1", "siape": "BUDGET01"}
+    with query_budget(2):
+        response = client.post("/auth/register/professor", json=payload)
+    assert response.status_code == 201, response.text
+
+
+def test_create_task_with_attachment(client, cenario):
+    tcc = cenario["tccs"][0]
+    with query_budget(6):
+        response = client.post(
+            f"/professors/tccs/{tcc['id']}/tarefas", data={"titulo": "Tarefa com anexo"},
+            files={"file": ("anexo.txt", b"x")}, headers=cenario["professor"],
+        )
+    assert response.status_code == 201 and len(response.json()["arquivos"]) == 1, response.text
+
+
+def test_create_task_for_many_tccs(client, cenario):
+    with query_budget(9):
+        response = client.post(
+            "/professors/tccs/tarefas", data={"titulo": "Marco para todos", "todos": "true"},
+            files={"file": ("marco.pdf", b"pdf")}, headers=cenario["professor"],
+        )
+    assert response.status_code == 201 and len(response.json()) == 3, response.text
+
+
+def test_task_status_change(client, cenario):
+    tcc = cenario["tccs"][1]
+    tarefa_id = _tarefas(client, tcc)[0]
+    # Inclui a releitura do status sob lock, de onde sai o delta dos contadores
+    with query_budget(7):
+        response = client.patch(f"/tarefas/{tarefa_id}/status", json={"status": "fazendo"}, headers=tcc["estudante"])
+    assert response.status_code == 200, response.text
+
+
+def test_batch_task_status_change(client, cenario):
+    tcc = cenario["tccs"][2]
+    primeira, segunda = _tarefas(client, tcc)[:2]
+    itens = [{"tarefa_id": primeira, "status": "fazendo"}, {"tarefa_id": segunda, "status": "revisar"}]
+    # Acesso, status atuais, UPDATE com CASE, contadores (escopos + upsert) e a releitura
+    with query_budget(7):
+        response = client.patch("/tarefas/status", json={"itens": itens}, headers=tcc["estudante"])
+    assert response.status_code == 200 and [t["status"] for t in response.json()] == ["fazendo", "revisar"], response.text
+
+
+def test_student_task_upload(client, cenario):
+    tcc = cenario["tccs"][0]
+    tarefa_id = _tarefas(client, tcc)[0]
+    # A entrega também marca a tarefa como feita, com os contadores
+    with query_budget(9):
+        response = client.post(
+            f"/students/tarefas/{tarefa_id}/arquivos", files={"file": ("entrega.txt", b"x")}, headers=tcc["estudante"]
+        )
+    assert response.status_code == 201, response.text
+
+
+# --- Leituras ---
+@pytest.mark.parametrize(
+    "path, budget",
+    [
+        ("/professors/students", 1),
+        ("/professors/me/tccs", 1),
+        ("/professors/me/painel", 1),
+        # convites + selectin de professor e estudante
+        ("/professors/me/convites-orientacao", 3),
+    ],
+)
+def test_professor_lists(client, cenario, path, budget):
+    with query_budget(budget):
+        response = client.get(path, headers=cenario["professor"])
+    assert response.status_code == 200, response.text
+
+
+def test_task_list(client, cenario):
+    tcc = cenario["tccs"][0]
+    # Donos + versão da lista, tarefas e selectin dos arquivos
+    with query_budget(3):
+        response = client.get(f"/tccs/{tcc['id']}/tarefas", headers=tcc["estudante"])
+    assert response.status_code == 200 and len(response.json()) >= 2, response.text
+
+
+def test_student_convites(client, cenario):
+    tcc = cenario["tccs"][0]
+    # Versão da lista, convites e selectin de professor e estudante
+    with query_budget(4):
+        response = client.get("/students/me/convites-orientacao", headers=tcc["estudante"])
+    assert response.status_code == 200 and len(response.json()) == 1, response.text
+
+
+def test_cursos_list(client, cenario):
+    with query_budget(1):
+        response = client.get("/admin/cursos")
+    assert response.status_code == 200, response.text
@@ -0,0 +1,111 @@
+"""
+As consultas quentes do crud usam os índices criados pelas migrações.
+
+Cada consulta é executada de verdade contra o banco de teste (SQLite); os SELECTs
+emitidos são capturados com seus parâmetros e passados por EXPLAIN QUERY PLAN.
+"""
+import asyncio
+from typing import Awaitable, Callable, List
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import crud
+from app.database import DATABASE_URL
+
+
+def query_plans(call: Callable[[AsyncSession], Awaitable]) -> List[str]:
+    """
+    Executa `call(db)` e devolve o plano de cada SELECT emitido, uma linha por consulta.
+    """
+    async def _run() -> List[str]:
+        engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+        captured = []
+
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                captured.append((statement, parameters))
+
+        event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+        try:
+            async with AsyncSession(engine) as db:
+                await call(db)
+            event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+            plans = []
+            async with engine.connect() as conn:
+                for statement, parameters in captured:
+                    rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                    plans.append(" | ".join(row[-1] for row in rows))
+            return plans
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(_run())
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema(client):
+    # O startup da aplicação cria o schema e aplica as migrações
+    yield
+
+
+@pytest.mark.parametrize(
+    "call, index",
+    [
+        pytest.param(
+            lambda db: crud.get_estudantes_by_curso_and_turma(db, 1, "A"),
+            "ix_estudantes_curso_turma_nome",
+            id="estudantes por curso e turma",
+        ),
+        pytest.param(lambda db: crud.get_estudantes(db, limit=20), "ix_estudantes_nome_id", id="estudantes paginados"),
+        pytest.param(lambda db: crud.get_tarefas_by_tcc_id(db, 1), "ix_tarefas_tcc_id", id="tarefas do TCC"),
+        pytest.param(lambda db: crud.get_tcc_tarefas_version(db, 1), "ix_tarefas_tcc_id", id="versão das tarefas"),
+        pytest.param(lambda db: crud.get_tccs_by_orientador_id(db, 1), "ix_tccs_orientador_id", id="TCCs do orientador"),
+        pytest.param(lambda db: crud.get_tccs_by_estudante_id(db, 1), "ix_tccs_estudante_id", id="TCCs do estudante"),
+        pytest.param(
+            lambda db: crud.get_convites_by_estudante_id(db, 1),
+            "ix_orientacao_convites_estudante_status",
+            id="convites do estudante",
+        ),
+        pytest.param(
+            lambda db: crud.get_pending_convite_for_estudante(db, 1),
+            "ix_orientacao_convites_estudante_status",
+            id="convite pendente",
+        ),
+        pytest.param(
+            lambda db: crud.get_convites_by_professor_id(db, 1),
+            "ix_orientacao_convites_professor_data",
+            id="convites do professor",
+        ),
+        pytest.param(
+            lambda db: crud.get_professores_by_departamento(db, "DC"),
+            "ix_professores_departamento",
+            id="professores do departamento",
+        ),
+        pytest.param(
+            lambda db: crud.get_admin_arquivos(db, limit=20),
+            # (data_upload) ou (data_upload, id): no SQLite, o primeiro já termina no rowid
+            "ix_admin_arquivos_data_upload",
+            id="arquivos gerais",
+        ),
+    ],
+)
+def test_hot_query_uses_index(call, index):
+    main_plan = query_plans(call)[0]
+    assert f"INDEX {index}" in main_plan, main_plan
+
+
+@pytest.mark.parametrize(
+    "call",
+    [
+        pytest.param(lambda db: crud.get_estudantes_by_curso_and_turma(db, 1, "A"), id="estudantes por curso e turma"),
+        pytest.param(lambda db: crud.get_convites_by_professor_id(db, 1), id="convites do professor"),
+        pytest.param(lambda db: crud.get_admin_arquivos(db, limit=20), id="arquivos gerais"),
+    ],
+)
+def test_ordering_comes_from_index(call):
+    # A ordenação sai do próprio índice, sem ordenar em uma B-tree temporária
+    main_plan = query_plans(call)[0]
+    assert "TEMP B-TREE" not in main_plan, main_plan
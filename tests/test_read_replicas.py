@@ -0,0 +1,128 @@
+"""
+Roteamento de leituras para réplicas, com dois arquivos SQLite fazendo o papel das
+réplicas do banco de teste (o primário).
+
+Cada réplica é uma cópia do primário em que o nome de um estudante foi trocado,
+então a resposta mostra de qual banco a leitura veio.
+"""
+import itertools
+import os
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import database, models
+from app.database import PRIMARY_STICKY_COOKIE, RoutingSession
+
+PRIMARIO_PATH = database.engine.url.database
+NOMES_REPLICAS = ("Réplica A", "Réplica B")
+
+
+@pytest.fixture
+def replicas(client, make_estudante, monkeypatch):
+    estudante_id, _ = make_estudante()
+    engines = []
+    primario = sqlite3.connect(PRIMARIO_PATH)
+    for indice, nome in enumerate(NOMES_REPLICAS):
+        path = os.path.join(os.path.dirname(PRIMARIO_PATH), f"replica_{indice}.db")
+        replica = sqlite3.connect(path)
+        primario.backup(replica)
+        replica.execute("UPDATE estudantes SET nome = ? WHERE id = ?", (nome, estudante_id))
+        replica.commit()
+        replica.close()
+        engines.append(create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool))
+    primario.close()
+
+    monkeypatch.setattr(database, "_replica_cycle", itertools.cycle(engines))
+    # app.main usa a mesma lista para decidir se grava o cookie de aderência
+    originais = list(database.replica_engines)
+    database.replica_engines[:] = engines
+    client.cookies.clear()
+    yield {"estudante_id": estudante_id, "engines": engines}
+    database.replica_engines[:] = originais
+    client.cookies.clear()
+
+
+def _nome_lido(client, headers, estudante_id) -> str:
+    response = client.get("/professors/students?limit=1000", headers=headers)
+    assert response.status_code == 200, response.text
+    return next(estudante["nome"] for estudante in response.json() if estudante["id"] == estudante_id)
+
+
+def _nome_no_primario(estudante_id) -> str:
+    with sqlite3.connect(PRIMARIO_PATH) as primario:
+        return primario.execute("SELECT nome FROM estudantes WHERE id = ?", (estudante_id,)).fetchone()[0]
+
+
+def test_reads_round_robin_between_replicas(client, make_professor, replicas):
+    _, headers = make_professor()
+    client.cookies.clear()
+    lidos = [_nome_lido(client, headers, replicas["estudante_id"]) for _ in range(4)]
+    assert lidos == [*NOMES_REPLICAS, *NOMES_REPLICAS]
+
+
+def test_writes_go_to_primary_and_reads_stick_to_it(client, make_professor, replicas):
+    _, headers = make_professor()
+    client.cookies.clear()
+    estudante_id = replicas["estudante_id"]
+    nome_primario = _nome_no_primario(estudante_id)
+    assert _nome_lido(client, headers, estudante_id) in NOMES_REPLICAS
+
+    response = client.put("/professors/me", json={"nome": "Professor Renomeado"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert PRIMARY_STICKY_COOKIE in client.cookies
+    # A escrita chegou ao primário e não às réplicas
+    for engine in replicas["engines"]:
+        with sqlite3.connect(engine.url.database) as replica:
+            assert replica.execute("SELECT count(*) FROM professores WHERE nome = 'Professor Renomeado'").fetchone()[0] == 0
+    with sqlite3.connect(PRIMARIO_PATH) as primario:
+        assert primario.execute("SELECT count(*) FROM professores WHERE nome = 'Professor Renomeado'").fetchone()[0] == 1
+
+    # Com o cookie, o cliente lê o que acabou de escrever (primário)
+    assert [_nome_lido(client, headers, estudante_id) for _ in range(2)] == [nome_primario] * 2
+    client.cookies.clear()
+    assert _nome_lido(client, headers, estudante_id) in NOMES_REPLICAS
+
+
+def test_session_switches_to_primary_after_write(replicas):
+    primario = database.engine.sync_engine
+    session = RoutingSession()
+    assert session.get_bind() is not primario
+    # Um INSERT vai para o primário e fixa a sessão nele
+    assert session.get_bind(clause=insert(models.Curso)) is primario
+    assert session.get_bind(clause=select(models.Curso)) is primario
+    session.close()
+
+
+def test_session_reads_primary_after_write_in_same_request(replicas):
+    primario = database.engine.sync_engine
+    request_state = SimpleNamespace(db_wrote=False)
+    session = RoutingSession()
+    session.info["request_state"] = request_state
+    assert session.get_bind(clause=select(models.Curso)) is not primario
+    # Outra sessão da mesma requisição escreveu (ex.: a dependência de escrita)
+    request_state.db_wrote = True
+    assert session.get_bind(clause=select(models.Curso)) is primario
+    session.close()
+
+
+def test_sticky_client_skips_response_cache(client, admin_headers, replicas):
+    client.cookies.clear()
+    response = client.post("/admin/cursos", json={"nome_curso": "Curso Recém-Criado"}, headers=admin_headers)
+    assert response.status_code == 201, response.text
+    aderencia = client.cookies.get(PRIMARY_STICKY_COOKIE)
+    assert aderencia
+
+    # Outro cliente lê da réplica (ainda sem o curso) e preenche o cache
+    client.cookies.clear()
+    nomes = [curso["nome_curso"] for curso in client.get("/admin/cursos?limit=1000").json()]
+    assert "Curso Recém-Criado" not in nomes
+
+    # Quem escreveu continua vendo a própria escrita
+    client.cookies.set(PRIMARY_STICKY_COOKIE, aderencia)
+    nomes = [curso["nome_curso"] for curso in client.get("/admin/cursos?limit=1000").json()]
+    assert "Curso Recém-Criado" in nomes
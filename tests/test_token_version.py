@@ -0,0 +1,46 @@
+"""
+Revogação de tokens por `token_version` e a migração que cria a coluna.
+"""
+from sqlalchemy import create_engine, inspect, text
+
+from app import models
+from app.migrations import upgrade_schema
+
+
+def test_self_update_cannot_change_role(client, make_professor):
+    _, headers = make_professor()
+    response = client.put("/professors/me", json={"nome": "Professor Promovido", "role": "admin"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert client.get("/auth/me", headers=headers).json()["role"] == models.UserRole.PROFESSOR.value
+    assert client.get("/admin/users/students", headers=headers).status_code == 403
+
+
+def test_role_change_revokes_existing_tokens(client, admin_headers, make_curso, make_professor):
+    professor_id, headers = make_professor()
+    response = client.put(f"/admin/cursos/{make_curso()}/assign-coordenador/{professor_id}", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    # O token antigo ainda diz "professor"
+    assert client.get("/professors/me", headers=headers).status_code == 401
+
+
+def test_migration_adds_token_version_to_existing_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legado.db'}")
+    try:
+        with engine.begin() as conn:
+            # Banco criado antes da coluna existir, com um usuário já cadastrado
+            models.Base.metadata.create_all(conn)
+            conn.execute(text("ALTER TABLE professores DROP COLUMN token_version"))
+            conn.execute(text("ALTER TABLE estudantes DROP COLUMN token_version"))
+            conn.execute(text(
+                "INSERT INTO professores (nome, email, hashed_password, siape, role, status) "
+                "VALUES ('Legado', 'legado@test.com', 'x', '999999', 'PROFESSOR', 'ATIVO')"
+            ))
+        with engine.begin() as conn:
+            applied = upgrade_schema(conn)
+        with engine.connect() as conn:
+            for table in ("professores", "estudantes"):
+                assert "token_version" in {column["name"] for column in inspect(conn).get_columns(table)}
+            assert conn.execute(text("SELECT token_version FROM professores")).scalar_one() == 0
+        assert 1 in applied
+    finally:
+        engine.dispose()